@@ -0,0 +1,365 @@
+"""Benchmarks of the hot paths of phypylib with a JSON history. Every case runs in a fresh process, such that cached
+results of one case do not speed up the next one and a case exceeding the timeout can be killed. For every case the
+wall-clock time, the increase of the peak resident memory and the size of the result (sympy.count_ops for symbolic
+results, number of entries otherwise) are recorded.
+
+parameter
+---------
+run [--filter SUBSTRING] [--timeout SECONDS] [--history FILE] [--label LABEL]
+    run the cases and append the results to the history
+
+compare [--history FILE] [--base INDEX] [--new INDEX] [--threshold FACTOR] [--min-time SECONDS]
+    compare two runs of the history, exit code 1 if the new run regressed
+
+list
+    names of all cases
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HISTORY = os.path.join(ROOT, "benchmarks", "history.json")
+os.environ["PHYPYLIB_CACHE"] = "off"                                                   # measure calculations, not loads
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# cases
+
+def dense_metric():
+    """Generic symmetric 4x4 metric with arbitrary functions g_ij(t, x, y, z) as entries. Too large to be simplified
+    within the timeout, it is only used without simplification.
+
+    return
+    ------
+    metric : Metric
+    """
+
+    from phypylib.general_relativity import Metric
+    import numpy as np
+    import sympy as sy
+    t, x, y, z = sy.symbols("t x y z", real=True)
+    matrix = np.empty((4, 4), dtype=object)
+    for i in range(4):
+        for j in range(i, 4):
+            matrix[i, j] = matrix[j, i] = sy.Function("g{}{}".format(i, j), real=True)(t, x, y, z)
+    return Metric(matrix=matrix, t=t, x=x, y=y, z=z)
+
+
+def block_metric():
+    """Metric with a generic symmetric (t, x) block and diagonal (y, z) part, all entries arbitrary functions of t and
+    x. The largest generic metric which is simplified within the timeout.
+
+    return
+    ------
+    metric : Metric
+    """
+
+    from phypylib.general_relativity import Metric
+    import numpy as np
+    import sympy as sy
+    t, x, y, z = sy.symbols("t x y z", real=True)
+    matrix = np.zeros((4, 4), dtype=object)
+    for i, j in [(0, 0), (0, 1), (1, 1), (2, 2), (3, 3)]:
+        matrix[i, j] = matrix[j, i] = sy.Function("g{}{}".format(i, j), real=True)(t, x)
+    return Metric(matrix=matrix, t=t, x=x, y=y, z=z)
+
+
+def metrics():
+    from phypylib import general_relativity as gr
+    return {
+        "minkowski": gr.MinkowskiMetric,
+        "schwarzschild": gr.SchwarzschildMetric,
+        "frw": gr.FRWMetric,
+        "graviwave": gr.GraviWave,
+        "dense": dense_metric,
+        "block": block_metric,
+    }
+
+
+SIMPLIFIED_METRICS = ["minkowski", "schwarzschild", "frw", "graviwave", "block"]         # finish within the timeout
+
+
+def curvature_case(metric_name, quantity, simplify):
+    def case():
+        metric = metrics()[metric_name]()
+        if quantity == "christoffel_symbols":
+            return metric.christoffel_symbols(retC=True, simplify=simplify)
+        if quantity == "ricci_tensor":
+            return metric.ricci_tensor(retR=True, simplify=simplify)
+        return metric.ricci_scalar(retR=True, simplify=simplify)
+    return case
+
+
+def klein_gordon_case(metric_name):
+    def case():
+        from phypylib.quantum_field_theory import RealScalarField4D
+        field = RealScalarField4D(name="phi", metric=metrics()[metric_name]())
+        return field.klein_gordon(retK=True, simplify=True)
+    return case
+
+
+WICK_NAMES = {                                                                          # fields -> names
+    2: ["a", "b"],
+    4: ["a", "b", "c", "c"],
+    6: ["a", "b"] + ["x"] * 4,
+    8: ["a", "b", "c", "d"] + ["x"] * 4,
+    10: ["a", "b"] + ["x"] * 4 + ["y"] * 4,
+    12: ["a", "b", "c", "d"] + ["x"] * 4 + ["y"] * 4,
+    14: ["a", "b"] + ["x"] * 4 + ["y"] * 4 + ["z"] * 4,
+    16: [str(i) for i in range(16)],
+}
+
+
+def wick_case(number, limit=None):
+    """Count the contraction patterns of WICK_NAMES[number], only the first limit patterns if limit is given.
+    """
+
+
+    def case():
+        from phypylib.quantum_field_theory import WickContraction
+
+        class Name():
+            def __init__(self, name):
+                self.name = name
+
+        wick = WickContraction(fields=[Name(name) for name in WICK_NAMES[number]], mode=None)
+        patterns = itertools.islice(wick.iter_patterns(), limit)
+        return sum(1 for pattern in patterns)
+    return case
+
+
+def graviwave_case(N):
+    def case():
+        import numpy as np
+        from phypylib.general_relativity import GraviWave
+        x = np.linspace(-5, 5, N)
+        X, Y = np.meshgrid(x, x)
+        graviwave = GraviWave()
+        frames = [graviwave.infinitesimal_distance(t=t, x=X, y=Y, z=0, Aplus=0.5, Across=0.1, omega=1, phi=0, psi=0)
+                  for t in np.linspace(0, 2*np.pi, 50)]
+        return np.stack(frames)
+    return case
+
+
+def cases():
+    registry = {}
+    for metric_name in metrics():
+        for quantity in ["christoffel_symbols", "ricci_tensor", "ricci_scalar"]:
+            for simplify in [False, True] if metric_name in SIMPLIFIED_METRICS else [False]:
+                name = "gr.{}.{}.{}".format(metric_name, quantity, "simplify" if simplify else "raw")
+                registry[name] = curvature_case(metric_name, quantity, simplify)
+        if metric_name in SIMPLIFIED_METRICS:
+            registry["qft.{}.klein_gordon".format(metric_name)] = klein_gordon_case(metric_name)
+    for number in sorted(WICK_NAMES):
+        if number == 16:                                                                # 15!! = 2027025 patterns
+            registry["qft.wick.16.first100000"] = wick_case(number, limit=100000)       # exceed the timeout
+        else:
+            registry["qft.wick.{:02d}".format(number)] = wick_case(number)
+    for N in [100, 500, 1000]:
+        registry["gr.graviwave.infinitesimal_distance.{}".format(N)] = graviwave_case(N)
+    return registry
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# measurement
+
+def result_size(result):
+    """Size of a result: sympy.count_ops for symbolic results, number of entries for arrays and the value for integers.
+
+    parameter
+    ---------
+    result : sympy expression, matrix, array, list, numpy array or int
+
+    return
+    ------
+    size : int
+    """
+
+    import sympy as sy
+    if isinstance(result, int):
+        return result
+    if hasattr(result, "shape") and not isinstance(result, (sy.MatrixBase, sy.NDimArray)):
+        return int(result.size)
+    if isinstance(result, (list, tuple)):
+        return sum(result_size(item) for item in result)
+    if isinstance(result, (sy.MatrixBase, sy.NDimArray)):
+        return sum(int(sy.count_ops(item)) for item in sy.flatten(result.tolist()))
+    return int(sy.count_ops(result))
+
+
+def _child(name, connection):
+    case = cases()[name]
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = case()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory
+    if sys.platform != "darwin":
+        peak *= 1024                                                                    # kilobytes on linux
+    connection.send({"status": "ok", "time": elapsed, "peak_memory": peak, "size": result_size(result)})
+
+
+def measure(name, timeout):
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_child, args=(name, child))
+    process.start()
+    deadline = time.monotonic() + timeout
+    while True:
+        if parent.poll(0.1):
+            record = parent.recv()
+            process.join()
+            return record
+        if not process.is_alive():
+            return {"status": "error", "time": None, "peak_memory": None, "size": None}
+        if time.monotonic() > deadline:
+            process.terminate()
+            process.join()
+            return {"status": "timeout", "time": timeout, "peak_memory": None, "size": None}
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# history
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_history(path, history):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(history, file, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run(arguments):
+    import sympy
+    import numpy
+    names = [name for name in cases() if arguments.filter is None or arguments.filter in name]
+    results = {}
+    for name in names:
+        record = measure(name, arguments.timeout)
+        results[name] = record
+        if record["status"] == "ok":
+            print("{:<55} {:>10.3f} s {:>10.1f} MB {:>12}".format(name, record["time"], record["peak_memory"] / 2**20,
+                                                                 record["size"]))
+        else:
+            print("{:<55} {:>10}".format(name, record["status"]))
+
+    history = load_history(arguments.history)
+    history.append({
+        "label": arguments.label,
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sympy": sympy.__version__,
+        "numpy": numpy.__version__,
+        "timeout": arguments.timeout,
+        "results": results,
+    })
+    save_history(arguments.history, history)
+
+
+def compare(arguments):
+    """Compare two runs of the history and flag regressions.
+
+    parameter
+    ---------
+    arguments : argparse.Namespace
+        history, base, new, threshold and min_time of the compare command
+
+    return
+    ------
+    regressions : int
+        number of cases which regressed
+    """
+
+    history = load_history(arguments.history)
+    if len(history) < 2:
+        print("compare: the history needs at least two runs")
+        return 0
+    base = history[arguments.base]
+    new = history[arguments.new]
+    print("base: {} {} {}".format(base["date"], base["commit"], base["label"] or ""))
+    print("new:  {} {} {}".format(new["date"], new["commit"], new["label"] or ""))
+    print("")
+
+    regressions = 0
+    for name in sorted(set(base["results"]) & set(new["results"])):
+        old_record = base["results"][name]
+        new_record = new["results"][name]
+        flags = []
+        if old_record["status"] == "ok" and new_record["status"] != "ok":
+            flags.append(new_record["status"])
+        elif old_record["status"] == "ok":
+            if new_record["time"] > arguments.threshold * max(old_record["time"], arguments.min_time):
+                flags.append("time x{:.1f}".format(new_record["time"] / max(old_record["time"], 1e-9)))
+            if new_record["peak_memory"] > arguments.threshold * max(old_record["peak_memory"], 2**20):
+                flags.append("memory x{:.1f}".format(new_record["peak_memory"] / max(old_record["peak_memory"], 1)))
+            if new_record["size"] > arguments.threshold * max(old_record["size"], 1):
+                flags.append("size x{:.1f}".format(new_record["size"] / max(old_record["size"], 1)))
+        regressions += bool(flags)
+
+        def describe(record):
+            return "{:.3f} s".format(record["time"]) if record["status"] == "ok" else record["status"]
+        print("{:<55} {:>12} -> {:>12}  {}".format(name, describe(old_record), describe(new_record),
+                                                   "REGRESSION " + ", ".join(flags) if flags else ""))
+
+    print("")
+    print("{} regression(s)".format(regressions))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="phypylib benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and append the results to the history")
+    run_parser.add_argument("--filter", default=None, help="only run cases containing this substring")
+    run_parser.add_argument("--timeout", type=float, default=300, help="timeout per case in seconds")
+    run_parser.add_argument("--history", default=HISTORY)
+    run_parser.add_argument("--label", default=None, help="label stored with the run")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two runs of the history")
+    compare_parser.add_argument("--history", default=HISTORY)
+    compare_parser.add_argument("--base", type=int, default=-2, help="index of the base run (default: second last)")
+    compare_parser.add_argument("--new", type=int, default=-1, help="index of the new run (default: last)")
+    compare_parser.add_argument("--threshold", type=float, default=1.5, help="factor counted as regression")
+    compare_parser.add_argument("--min-time", type=float, default=0.05, dest="min_time",
+                                help="times below this many seconds are not compared")
+
+    subparsers.add_parser("list", help="list all cases")
+
+    arguments = parser.parse_args()
+    if arguments.command == "run":
+        run(arguments)
+    elif arguments.command == "compare":
+        sys.exit(1 if compare(arguments) else 0)
+    else:
+        for name in cases():
+            print(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,146 @@
+import queue
+import threading
+import contourpy
 from imports import *
 
+
+class PolarizationViewer():
+    """Interactive contour plot of GraviWave.infinitesimal_distance with a time slider.
+
+    The wave is periodic in 2 pi / omega, hence the contour lines are calculated for n_frames equidistant times of one
+    period only and cached. Moving the slider picks the nearest cached frame and replaces the segments of the existing
+    line collection instead of clearing the axes. The background thread only calculates contour lines and never touches
+    matplotlib, which is not thread-safe: finished frames are put into a queue, which a timer of the figure empties on
+    the GUI thread, and the plot is redrawn once the frame selected by the slider has arrived. matplotlib is imported
+    when the figure is opened.
+
+    parameter
+    ---------
+    x, y : numpy arrays
+        1-dim grids of the x and y coordinate
+
+    level : float
+        contour level of the spatial distance
+
+    Aplus, Across, omega, phi, psi : float
+        see GraviWave.infinitesimal_distance
+
+    n_frames : int
+        number of cached frames per period
+
+    periods : float
+        range of the slider in periods
+
+    background : bool
+        if True the cache is filled in a background thread
+    """
+
+    def __init__(self, x, y, level, Aplus, Across, omega, phi, psi, n_frames=200, periods=5, background=True):
+        self.level = level
+        self.period = 2*np.pi / omega
+        self.n_frames = n_frames
+        self.periods = periods
+        self.times = np.arange(n_frames) * self.period / n_frames
+        X, Y = np.meshgrid(x, y)
+        self.X = X
+        self.Y = Y
+        self.polarization = GraviWave().polarization_frames(x=X, y=Y, z=0, Aplus=Aplus, Across=Across, omega=omega,
+                                                            phi=phi, psi=psi)
+        self.cache = {}                                                                 # frame index -> segments
+        self.lock = threading.Lock()
+        self.buffer = np.empty(self.polarization.shape)
+        self.stop = threading.Event()
+        self.finished = queue.Queue()                                                   # frames done in the background
+        self.wanted = None                                                              # frame the slider waits for
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.fill_cache, daemon=True)
+            self.thread.start()
+
+    def frame_index(self, t):
+        """Index of the cached frame closest to the time t.
+        """
+
+        return int(np.round((t % self.period) / self.period * self.n_frames)) % self.n_frames
+
+    def segments(self, index):
+        """Contour lines of the frame with the given index, calculated on first request.
+        """
+
+        segments = self.cache.get(index)
+        if segments is None:
+            with self.lock:                                                             # shared buffer
+                Z = self.polarization.frame(self.times[index], out=self.buffer)
+                segments = contourpy.contour_generator(self.X, self.Y, Z).lines(self.level)
+            self.cache[index] = segments
+        return segments
+
+    def fill_cache(self):
+        """Calculate the contour lines of all frames, runs in the background thread.
+        """
+
+        buffer = np.empty(self.polarization.shape)
+        pending = list(range(self.n_frames))
+        while pending and not self.stop.is_set():
+            wanted = self.wanted
+            index = wanted if wanted in pending else pending[0]                         # the slider's frame first
+            pending.remove(index)
+            if index not in self.cache:
+                Z = self.polarization.frame(self.times[index], out=buffer)
+                self.cache[index] = contourpy.contour_generator(self.X, self.Y, Z).lines(self.level)
+            self.finished.put(index)
+
+    def show(self):
+        """Open the figure with the time slider.
+        """
+
+        from matplotlib.collections import LineCollection
+
+        fig = plt.figure()
+        ax = fig.add_subplot(111, aspect="equal")
+        fig.subplots_adjust(bottom=0.3)
+        lines = LineCollection(self.segments(0))
+        ax.add_collection(lines)
+        ax.set_xlim(self.X.min(), self.X.max())
+        ax.set_ylim(self.Y.min(), self.Y.max())
+
+        axT = plt.axes([0.25, 0.15, 0.45, 0.03])
+        tSlider = Slider(axT, r"$t$", 0, self.periods*self.period, valinit=0, valfmt="%1.1f")
+
+        def update(val):
+            index = self.frame_index(tSlider.val)
+            if index not in self.cache and self.thread is not None and self.thread.is_alive():
+                self.wanted = index                                                     # drawn by poll once it is done
+                return
+            self.wanted = None
+            lines.set_segments(self.segments(index))
+            fig.canvas.draw_idle()
+
+        def poll():
+            finished = set()
+            while True:
+                try:
+                    finished.add(self.finished.get_nowait())
+                except queue.Empty:
+                    break
+            if self.wanted is not None and self.wanted in finished:
+                lines.set_segments(self.cache[self.wanted])
+                self.wanted = None
+                fig.canvas.draw_idle()
+
+        tSlider.on_changed(update)
+        timer = fig.canvas.new_timer(interval=50)                                       # runs poll on the GUI thread
+        timer.add_callback(poll)
+        timer.start()
+        self.fig = fig
+        self.slider = tSlider
+        self.timer = timer
+
+        plt.show()
+        self.stop.set()
+        timer.stop()
+
+
 def main():
     # parameter
     Aplus = 0.5
@@ -9,33 +150,12 @@ def main():
     psi = 0
     level = 5
     N = 100
-    T = 5*2*np.pi / omega
 
     # plotting
-    graviwave = GraviWave()
     x = np.linspace(-5, 5, N)
     y = np.linspace(-5, 5, N)
-    X, Y = np.meshgrid(x, y)
-    Z = graviwave.infinitesimal_distance(t=0, x=X, y=Y, z=0, Aplus=Aplus, Across=Across, omega=omega, phi=phi, psi=psi)
-
-    fig = plt.figure()
-    ax = fig.add_subplot(111, aspect="equal")
-    fig.subplots_adjust(bottom=0.3)
-    ax.contour(X, Y, Z, levels=[level])
-
-    axT = plt.axes([0.25, 0.15, 0.45, 0.03])
-    tSlider = Slider(axT, r"$t$", 0, T, valinit=0,valfmt="%1.1f")
-
-    def update(val):
-        t = tSlider.val
-        Z = graviwave.infinitesimal_distance(t=t, x=X, y=Y, z=0, Aplus=Aplus, Across=Across, omega=omega, phi=phi, psi=psi)
-        ax.cla()
-        ax.contour(X, Y, Z, levels=[level])
-        fig.canvas.draw_idle()
-
-    tSlider.on_changed(update)
-
-    plt.show()
+    viewer = PolarizationViewer(x=x, y=y, level=level, Aplus=Aplus, Across=Across, omega=omega, phi=phi, psi=psi)
+    viewer.show()
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,12 @@
 from phypylib.general_relativity import *
+from phypylib.numeric_metric import *
 from phypylib.quantum_field_theory import *
+from phypylib.evolution import *
+from phypylib.family import *
+from phypylib.simplification import Simplification, Truncation
+from phypylib._lazy import LazyAttribute, LazyModule
 
-import numpy as np
-import sympy as sy
-from matplotlib import pyplot as plt
-from matplotlib.widgets import Slider
+np = LazyModule("numpy")
+sy = LazyModule("sympy")
+plt = LazyModule("matplotlib.pyplot")                                                   # imported on first use
+Slider = LazyAttribute("matplotlib.widgets", "Slider")
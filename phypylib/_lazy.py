@@ -0,0 +1,74 @@
+import importlib
+
+
+class LazyModule():
+    """Stand-in for a module which is imported on first attribute access, e.g. sy = LazyModule("sympy"). Importing
+    sympy and numpy takes a few hundred milliseconds, which dominates short-lived processes that never use them. Every
+    attribute is looked up in the module once and afterwards served from the instance, such that the indirection costs
+    nothing in hot loops.
+
+    parameter
+    ---------
+    name : string
+        name of the module
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        value = getattr(self._load(), attribute)
+        self.__dict__[attribute] = value
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        if self._module is None:
+            return "<lazy module '{}'>".format(self._name)
+        return repr(self._module)
+
+
+class LazyAttribute():
+    """Stand-in for an attribute of a module, e.g. a class, which imports the module on first use, e.g.
+    Slider = LazyAttribute("matplotlib.widgets", "Slider"). Calls and attribute lookups are forwarded, isinstance and
+    subclassing need the real object, see load.
+
+    parameter
+    ---------
+    module : string
+        name of the module
+
+    attribute : string
+        name of the attribute in the module
+    """
+
+    def __init__(self, module, attribute):
+        self._module = module
+        self._attribute = attribute
+        self._value = None
+
+    def load(self):
+        if self._value is None:
+            self._value = getattr(importlib.import_module(self._module), self._attribute)
+        return self._value
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("_"):
+            raise AttributeError(attribute)
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        if self._value is None:
+            return "<lazy attribute '{}.{}'>".format(self._module, self._attribute)
+        return repr(self._value)
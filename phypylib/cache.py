@@ -0,0 +1,246 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from phypylib.simplification import Truncation
+from phypylib._lazy import LazyModule
+
+sy = LazyModule("sympy")
+
+
+CACHE_VERSION = 3                                                                       # increase whenever a change alters
+                                                                                        # the calculated results
+
+
+class DiskCache():
+    """Content-addressed cache of calculated quantities in a directory. Entries are pickled dicts stored under the
+    sha256 of a canonical description of the calculation (see key), written to a temporary file and moved into place
+    with os.replace, such that several processes can share one directory. Every entry carries a stamp (CACHE_VERSION
+    and the sympy version), entries with another stamp are treated as missing and removed. If the directory grows beyond
+    max_bytes the least recently used entries are removed. The size of the directory is tracked with the entries this
+    instance writes and counted again every rescan stores, or when the limit is exceeded.
+
+    The entries are loaded with pickle.load, which executes any code a crafted cache file contains. Only use directories
+    nobody else can write to, never a directory shared with other users.
+
+    parameter
+    ---------
+    directory : string
+        cache directory, created if needed
+
+    max_bytes : int
+        size limit of the directory
+
+    rescan : int
+        number of stores after which the size of the directory is counted again, to take the entries of other processes
+        into account
+    """
+
+    def __init__(self, directory, max_bytes=2**29, rescan=1000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan = rescan
+        self._size = None                                                               # bytes in the directory, None:
+        self._stores = 0                                                                # not counted yet
+
+    def stamp(self):
+        """Stamp of the entries written by this version.
+        """
+
+        return (CACHE_VERSION, sy.__version__)
+
+    def key(self, *parts):
+        """sha256 of the srepr of the parts.
+        """
+
+        description = "\n".join(sy.srepr(part) for part in parts)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".pkl")
+
+    def load(self, key):
+        """Entry stored under key or None. A hit marks the entry as recently used.
+        """
+
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if not isinstance(entry, dict) or entry.get("stamp") != self.stamp():
+            self._remove(path)                                                          # stale entry
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def store(self, key, value):
+        """Store value (a dict of picklable objects) under key and evict old entries if the cache is too large.
+        """
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous = os.stat(path).st_size
+        except OSError:
+            previous = 0
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                pickle.dump({"stamp": self.stamp(), "value": value}, file, protocol=pickle.HIGHEST_PROTOCOL)
+                size = file.tell()
+            os.replace(temporary, path)
+        except BaseException:
+            self._remove(temporary)
+            raise
+
+        self._stores += 1
+        if self._size is None or self._stores % self.rescan == 0:
+            self._size = None                                                           # count the directory again
+        else:
+            self._size += size - previous
+        if self._size is None or self._size > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """List of (last use, size, path) of all entries.
+        """
+
+        entries = []
+        for root, directories, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    status = os.stat(path)
+                except OSError:                                                         # removed by another process
+                    continue
+                entries.append((status.st_mtime, status.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits into max_bytes.
+        """
+
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            self._remove(path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        """Remove all entries.
+        """
+
+        for mtime, size, path in self.entries():
+            self._remove(path)
+        self._size = 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_CACHE = []                                                                             # [] = not configured yet
+
+
+def default_directory():
+    """Cache directory given by the environment variable PHYPYLIB_CACHE. The cache is opt-in: without PHYPYLIB_CACHE (or
+    with PHYPYLIB_CACHE=off) nothing is cached, PHYPYLIB_CACHE=on uses $XDG_CACHE_HOME/phypylib or ~/.cache/phypylib,
+    any other value is the directory itself.
+    """
+
+    directory = os.environ.get("PHYPYLIB_CACHE")
+    if not directory or directory.lower() in ("off", "0", "false", "no"):
+        return None
+    if directory.lower() not in ("on", "1", "true", "yes"):
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "phypylib")
+
+
+def get_cache():
+    """Cache used by the calculations, a DiskCache in default_directory() unless set_cache was called.
+    """
+
+    if not _CACHE:
+        directory = default_directory()
+        _CACHE.append(DiskCache(directory) if directory is not None else None)
+    return _CACHE[0]
+
+
+def set_cache(cache):
+    """Use the given DiskCache for all further calculations, None disables caching.
+    """
+
+    _CACHE[:] = [cache]
+
+
+def strategy_key(strategy):
+    """Canonical description of a simplification strategy, None if it cannot be described (custom passes or measure),
+    in which case the result is not cached. Results of strategies with a timeout are not cached either: whether the
+    budget of a component is used up depends on the machine and its load, a result cut short would be returned
+    permanently.
+    """
+
+    if isinstance(strategy, Truncation):
+        description = strategy_key(strategy.strategy)
+        if description is None:
+            return None
+        return ("truncation", strategy.epsilon, strategy.order) + description
+    if strategy is None:
+        return ("none",)
+    if strategy.timeout is not None or strategy.measure is not None \
+            or not all(isinstance(p, str) for p in strategy.passes):
+        return None
+    return (tuple(strategy.passes), strategy.max_ops, strategy.intermediate)
+
+
+def load_quantity(owner, key):
+    """Set the attributes stored under key on owner. Returns True on a hit.
+    """
+
+    cache = get_cache()
+    if cache is None or key is None:
+        return False
+    attributes = cache.load(key)
+    if attributes is None:
+        return False
+    for name, value in attributes.items():
+        setattr(owner, name, value)
+    return True
+
+
+def store_quantity(owner, key, names):
+    """Store the attributes names of owner under key.
+    """
+
+    cache = get_cache()
+    if cache is None or key is None:
+        return
+    try:
+        cache.store(key, {name: getattr(owner, name) for name in names})
+    except OSError:                                                                     # the cache is an optimisation
+        pass
+
+
+def quantity_key(quantity, strategy, *parts):
+    """Cache key of a quantity calculated with the simplification strategy from the parts (e.g. the metric matrix and
+    the coordinates), None if there is no cache or the strategy cannot be described.
+    """
+
+    cache = get_cache()
+    description = strategy_key(strategy)
+    if cache is None or description is None:
+        return None
+    return cache.key(quantity, description, *parts)
@@ -0,0 +1,338 @@
+import sys
+from phypylib.numerics import TensorKernel
+from phypylib.numeric_metric import finite_difference, second_difference
+from phypylib.instrumentation import stage, traced
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+sy = LazyModule("sympy")
+
+
+class KleinGordonEvolver():
+    """Time evolution of the Klein-Gordon equation box phi + m^2 phi = 0 of a real scalar field on a spatial grid. The
+    coefficients of the d'Alembert operator of the metric (see Metric.dalembert_operator) are compiled into numpy
+    kernels and evaluated on the grid, the spatial derivatives are vectorized finite difference stencils (see
+    phypylib.numeric_metric). With pi = partial_t phi the equation is solved as first order system
+    partial_t phi = pi,
+    partial_t pi = -(g^{ij} partial_i partial_j phi + 2 g^{0i} partial_i pi + b^0 pi + b^i partial_i phi + m^2 phi) / g^{00}.
+    Along non-periodic axes the field is held fixed in the order/2 outermost points.
+
+    Every coefficient is evaluated only on the grid axes it depends on (e.g. an array of shape (n, 1, 1) for a function
+    of r) and only once if it does not depend on time. Next to phi and pi the integrator needs about 9 (rk4) or 6
+    (leapfrog) arrays of the grid size, use dtype=numpy.float32 for large grids.
+
+    parameter
+    ---------
+    field : RealScalarField4D
+        field and metric, the first coordinate of the metric is the time
+
+    axes : list
+        one uniformly spaced 1-dim numpy array per spatial coordinate
+
+    order : int
+        order of accuracy of the finite differences, 2, 4 or 6
+
+    periodic : bool or list of bool
+        periodic boundaries, for all axes or per axis
+
+    method : "rk4" or "leapfrog"
+        "rk4": classical Runge-Kutta, "leapfrog": kick-drift-kick with the friction term b^0 pi treated implicitly,
+        needs g^{0i} = 0
+
+    simplify : bool or Simplification
+        simplification of the coefficients of the operator, if it has not been calculated yet
+
+    dtype : numpy dtype
+        dtype of the field arrays
+
+    parameters : numbers or functions
+        values of the free parameters of the metric and the mass by name, e.g. Rs=1, m=0.5, and functions of the time
+        for undefined functions, e.g. a=lambda t: t**(2/3) with a_t and a_tt for their derivatives (see TensorKernel)
+    """
+
+    def __init__(self, field, axes, order=2, periodic=False, method="rk4", simplify=True, dtype=float, **parameters):
+        metric = field.metric
+        if len(axes) != metric.dim - 1:
+            sys.exit("KleinGordonEvolver: one axis per spatial coordinate is needed")
+        if order not in (2, 4, 6):
+            sys.exit("KleinGordonEvolver: order has to be 2, 4 or 6")
+        if method not in ("rk4", "leapfrog"):
+            sys.exit("KleinGordonEvolver: method has to be 'rk4' or 'leapfrog'")
+        if isinstance(periodic, bool):
+            periodic = [periodic] * len(axes)
+
+        self.field = field                                                              # RealScalarField4D
+        self.coords = list(metric.coords)                                               # time first
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]                    # spatial grid
+        self.shape = tuple(len(axis) for axis in self.axes)                             # grid shape
+        self.spacings = []                                                              # grid spacings
+        for axis in self.axes:
+            spacing = axis[1] - axis[0] if len(axis) > 1 else 1.0
+            if len(axis) > 2 and not np.allclose(np.diff(axis), spacing):
+                sys.exit("KleinGordonEvolver: the axes need a uniform spacing")
+            self.spacings.append(spacing)
+        self.order = order                                                              # order of the stencils
+        self.periodic = [bool(p) or len(axis) == 1 for p, axis in zip(periodic, self.axes)]
+        self.method = method                                                            # time integrator
+        self.dtype = np.dtype(dtype)
+        self.parameters = parameters                                                    # numeric parameters
+
+        operator = metric.dalembert_operator(retD=True, simplify=simplify)
+        second, first = operator.second, operator.first
+        if second[0, 0] == 0:
+            sys.exit("KleinGordonEvolver: g^{00} vanishes, the first coordinate is no time")
+        if method == "leapfrog" and any(second[0, i] != 0 for i in range(1, metric.dim)):
+            sys.exit("KleinGordonEvolver: leapfrog needs g^{0i} = 0, use method='rk4'")
+
+        # coefficients of the terms, name -> sympy expression, all divided by -g^{00}
+        scale = -1 / second[0, 0]
+        expressions = {"mass": scale * field.m**2}
+        for i in range(1, metric.dim):
+            for j in range(i, metric.dim):
+                expressions[("second", i - 1, j - 1)] = scale * second[i, j] * (1 if i == j else 2)
+            expressions[("mixed", i - 1)] = 2 * scale * second[0, i]
+            expressions[("first", i - 1)] = scale * first[i]
+        expressions["friction"] = scale * first[0]
+        with stage("compile", owner=type(self).__name__):
+            self._expressions = {}                                                      # name -> expression
+            self._kernels = {}                                                          # name -> TensorKernel
+            for name, expr in expressions.items():
+                expr = sy.sympify(expr)
+                if expr != 0:
+                    self._expressions[name] = expr
+                    self._kernels[name] = TensorKernel(expr, coords=self.coords)
+        self._static = {name: self._evaluate(name, 0.0) for name in self._kernels
+                        if not self._expressions[name].has(self.coords[0])}
+        self._time = None                                                               # time of self._dynamic
+        self._dynamic = {}
+
+        self._buffers = {}
+        self._force_time = None                                                         # force of the last leapfrog
+        self._boundary = []                                                             # step is reused
+        for axis, (length, p) in enumerate(zip(self.shape, self.periodic)):
+            if not p:
+                for layer in [slice(0, order // 2), slice(length - order // 2, length)]:
+                    index = [slice(None)] * len(self.shape)
+                    index[axis] = layer
+                    self._boundary.append(tuple(index))
+
+    def _evaluate(self, name, t):
+        """Coefficient name at time t on the grid axes it depends on.
+        """
+
+        kernel = self._kernels[name]
+        expr = self._expressions[name]
+        coordinates = [np.asarray(t, dtype=float)]
+        for n, axis in enumerate(self.axes):
+            if not expr.has(self.coords[n + 1]):                                        # no grid axis needed
+                coordinates.append(np.zeros(()))
+                continue
+            shape = [1] * len(self.axes)
+            shape[n] = len(axis)
+            coordinates.append(axis.reshape(shape))
+        parameters = {}
+        for parameter in kernel.parameters:
+            if parameter not in self.parameters:
+                sys.exit("KleinGordonEvolver: missing parameter " + parameter)
+            parameters[parameter] = self.parameters[parameter]
+        values = kernel(*coordinates, **parameters)
+        return values.astype(self.dtype)
+
+    def coefficients(self, t):
+        """All coefficients at time t, name -> array broadcastable to the grid.
+        """
+
+        if self._time != t:
+            self._dynamic = {name: self._evaluate(name, t) for name in self._kernels if name not in self._static}
+            self._time = t
+        coefficients = dict(self._static)
+        coefficients.update(self._dynamic)
+        return coefficients
+
+    def _buffer(self, name):
+        buffer = self._buffers.get(name)
+        if buffer is None:
+            buffer = self._buffers[name] = np.empty(self.shape, dtype=self.dtype)
+        return buffer
+
+    def force(self, phi, pi, t, out=None, friction=True):
+        """Right hand side partial_t pi of the equation.
+
+        parameter
+        ---------
+        phi, pi : numpy arrays
+            field and its time derivative on the grid
+
+        t : float
+            time
+
+        out : numpy array
+            preallocated result
+
+        friction : bool
+            if False the term b^0 pi / g^{00} is left out
+
+        return
+        ------
+        force : numpy array
+        """
+
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+        coefficients = self.coefficients(t)
+        work = self._buffer("work")
+        out[...] = 0
+        if "mass" in coefficients:
+            np.multiply(phi, coefficients["mass"], out=out)
+
+        derivatives = {}
+        for axis in range(len(self.axes)):
+            if ("first", axis) in coefficients or any(("second", axis, j) in coefficients
+                                                      for j in range(axis + 1, len(self.axes))):
+                derivatives[axis] = finite_difference(phi, axis, self.spacings[axis], self.order,
+                                                      self.periodic[axis], out=self._buffer(("dphi", axis)))
+        for name, coefficient in coefficients.items():
+            if name[0] == "second":
+                i, j = name[1:]
+                if i == j:
+                    second_difference(phi, i, self.spacings[i], self.order, self.periodic[i], out=work)
+                else:
+                    finite_difference(derivatives[i], j, self.spacings[j], self.order, self.periodic[j], out=work)
+                work *= coefficient
+            elif name[0] == "mixed":
+                finite_difference(pi, name[1], self.spacings[name[1]], self.order, self.periodic[name[1]], out=work)
+                work *= coefficient
+            elif name[0] == "first":
+                np.multiply(derivatives[name[1]], coefficient, out=work)
+            elif name == "friction" and friction:
+                np.multiply(pi, coefficient, out=work)
+            else:
+                continue
+            out += work
+
+        for index in self._boundary:
+            out[index] = 0
+        return out
+
+    @traced("evolve")
+    def evolve(self, phi, pi, t0, dt, steps, every=1, path=None, momentum=False):
+        """Evolve the initial data over the given number of steps and record a snapshot every few steps. The snapshots
+        are written into a memory-mapped .npy file (numpy.lib.format.open_memmap) if path is given, such that long runs
+        do not need to keep them in memory.
+
+        parameter
+        ---------
+        phi, pi : numpy arrays
+            field and its time derivative at t0 on the grid, broadcasted to the grid shape (copied)
+
+        t0 : float
+            initial time
+
+        dt : float
+            time step, has to satisfy the Courant condition of the grid
+
+        steps : int
+            number of time steps
+
+        every : int
+            a snapshot is recorded every every steps, the initial data is the first snapshot
+
+        path : string
+            .npy file for the snapshots, None: the snapshots are kept in memory
+
+        momentum : bool
+            if True also pi is recorded
+
+        return
+        ------
+        snapshots : numpy array or numpy.memmap
+            shape (steps // every + 1,) + grid shape, or (steps // every + 1, 2) + grid shape with momentum=True
+
+        times : numpy array
+            time of every snapshot
+        """
+
+        phi = np.array(np.broadcast_to(phi, self.shape), dtype=self.dtype)
+        pi = np.array(np.broadcast_to(pi, self.shape), dtype=self.dtype)
+        for index in self._boundary:
+            pi[index] = 0
+        self._force_time = None
+
+        count = steps // every + 1
+        shape = (count,) + ((2,) if momentum else ()) + self.shape
+        if path is None:
+            snapshots = np.empty(shape, dtype=self.dtype)
+        else:
+            snapshots = np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=shape)
+        times = t0 + dt * every * np.arange(count)
+
+        def record(n):
+            if momentum:
+                snapshots[n, 0] = phi
+                snapshots[n, 1] = pi
+            else:
+                snapshots[n] = phi
+
+        record(0)
+        for n in range(1, steps + 1):
+            self.step(phi, pi, t0 + (n - 1) * dt, dt)
+            if n % every == 0:
+                record(n // every)
+        if path is not None:
+            snapshots.flush()
+
+        return snapshots, times
+
+    def step(self, phi, pi, t, dt):
+        """Advance phi and pi in place from t to t + dt.
+        """
+
+        if self.method == "rk4":
+            self._rk4(phi, pi, t, dt)
+        else:
+            self._leapfrog(phi, pi, t, dt)
+
+    def _rk4(self, phi, pi, t, dt):
+        phi_stage, pi_stage = self._buffer("phi_stage"), self._buffer("pi_stage")
+        phi_sum, pi_sum = self._buffer("phi_sum"), self._buffer("pi_sum")
+        force = self._buffer("force")
+
+        self.force(phi, pi, t, out=force)                                               # k1 = (pi, force)
+        np.copyto(phi_sum, pi)
+        np.copyto(pi_sum, force)
+        np.copyto(pi_stage, pi)
+        for fraction, weight in [(0.5, 2), (0.5, 2), (1.0, 1)]:                         # k2, k3, k4
+            np.multiply(pi_stage, fraction * dt, out=phi_stage)                         # pi_stage is the slope of
+            phi_stage += phi                                                            # phi in the previous stage
+            np.multiply(force, fraction * dt, out=pi_stage)
+            pi_stage += pi
+            self.force(phi_stage, pi_stage, t + fraction * dt, out=force)
+            for n in range(weight):
+                phi_sum += pi_stage
+                pi_sum += force
+        phi_sum *= dt / 6
+        pi_sum *= dt / 6
+        phi += phi_sum
+        pi += pi_sum
+
+    def _leapfrog(self, phi, pi, t, dt):
+        force = self._buffer("force")
+        if self._force_time != t:
+            self.force(phi, pi, t, out=force, friction=False)
+        self._kick(pi, force, t, dt / 2)
+        phi += dt * pi
+        self.force(phi, pi, t + dt, out=force, friction=False)
+        self._kick(pi, force, t + dt, dt / 2)
+        self._force_time = t + dt
+
+    def _kick(self, pi, force, t, h):
+        """pi' = pi + h (force + c (pi + pi') / 2) with the friction coefficient c.
+        """
+
+        friction = self.coefficients(t).get("friction")
+        if friction is None:
+            pi += h * force
+            return
+        pi *= 1 + friction * h / 2
+        pi += h * force
+        pi /= 1 - friction * h / 2
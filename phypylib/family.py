@@ -0,0 +1,244 @@
+import itertools
+import os
+import sys
+import uuid
+from phypylib.numerics import TensorKernel
+from phypylib.parallel import map_components
+from phypylib.instrumentation import stage, traced
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+sy = LazyModule("sympy")
+
+
+_KERNELS = {}                                                                           # (token, quantity) -> kernel,
+                                                                                        # kernels rebuilt in a worker
+
+
+def parameter_grid(**values):
+    """All combinations of the given parameter values as flat arrays, the input of MetricFamily.evaluate for a scan over
+    a regular grid of parameters.
+
+    parameter
+    ---------
+    values : lists or 1-dim arrays
+        values of every parameter by name, e.g. Rs=numpy.linspace(0.5, 2, 100), k=[-1, 0, 1]
+
+    return
+    ------
+    parameters : dict
+        name -> 1-dim array of length prod(len(values)), the last parameter varies fastest
+    """
+
+    names = list(values)
+    grids = np.meshgrid(*[np.asarray(values[name]) for name in names], indexing="ij")
+    return {name: grid.ravel() for name, grid in zip(names, grids)}
+
+
+class MetricFamily():
+    """Metric with free parameters (e.g. Rs of SchwarzschildMetric, k and a(t) of FRWMetric) as a family of metrics,
+    which is evaluated for many parameter points at once. The quantities are calculated once with symbolic parameters
+    and compiled once into TensorKernels, the parameter points are a batch axis of the numeric evaluation:
+    evaluate(quantity, *coordinates, **parameters) returns an array of shape (tensor shape) + (n_params,) + (grid shape).
+
+    parameter
+    ---------
+    metric : Metric
+
+    quantities : list
+        names of the quantities, see Metric.numeric_kernel
+
+    simplify : bool or Simplification
+        simplification used for quantities which have not been calculated yet
+
+    cse : bool
+        if True common subexpressions of all components are eliminated
+
+    workers : None, int or concurrent.futures.Executor
+        used for the symbolic calculation of the quantities
+    """
+
+    def __init__(self, metric, quantities, simplify=True, cse=True, workers=None):
+        if isinstance(quantities, str):
+            quantities = [quantities]
+        self.metric = metric
+        self.coords = list(metric.coords)
+        self.cse = cse
+        self.tensors = {}                                                               # quantity -> symbolic tensor
+        self.kernels = {}                                                               # quantity -> TensorKernel
+        for quantity in quantities:
+            with stage("family_" + quantity):
+                self.tensors[quantity] = metric.numeric_tensor(quantity, simplify=simplify, workers=workers)
+                self.kernels[quantity] = TensorKernel(self.tensors[quantity], coords=self.coords, cse=cse)
+        self._token = uuid.uuid4().hex                                                  # identifies the kernels in
+                                                                                        # worker processes
+
+    @property
+    def quantities(self):
+        return list(self.kernels)
+
+    @property
+    def parameters(self):
+        """Names of the parameters of all quantities.
+        """
+
+        return sorted(set(itertools.chain(*[kernel.parameters for kernel in self.kernels.values()])))
+
+    def shape(self, quantity, *coordinates, **parameters):
+        """Shape of evaluate(quantity, *coordinates, **parameters).
+        """
+
+        n_params, coordinates, parameters = self._batch(coordinates, parameters)
+        return self._kernel(quantity).shape + self._grid_shape(n_params, coordinates, parameters)
+
+    @traced("family_evaluate")
+    def evaluate(self, quantity, *coordinates, chunk_size=None, workers=None, out=None, dtype=float, **parameters):
+        """Evaluate a quantity for all parameter points at all coordinates in one vectorized call.
+
+        parameter
+        ---------
+        quantity : string
+            one of self.quantities
+
+        coordinates : arrays
+            one array (or number) for each coordinate, broadcasted against each other to the grid shape. The grid is the
+            same for all parameter points
+
+        chunk_size : int
+            maximum number of values (parameter points x grid points) evaluated at once, see TensorKernel
+
+        workers : None, int or concurrent.futures.Executor
+            the parameter points are split into shards which are evaluated in a process pool, every worker compiles the
+            kernel once. Function parameters have to be picklable (module-level functions) in this case
+
+        out : numpy array
+            preallocated output (e.g. a numpy.memmap) of shape self.shape(quantity, *coordinates, **parameters)
+
+        dtype : numpy dtype
+            dtype of the output if out is not given
+
+        parameters : numbers, arrays or functions
+            values of the parameters by name. A number is shared by all parameter points, a 1-dim array holds one
+            value per parameter point, an array of shape (n_params,) + (grid shape) one value per parameter point and
+            grid point (e.g. a, a_t, a_tt of FRWMetric). Functions are called with the coordinates, see TensorKernel,
+            and are shared by all parameter points. All 1-dim arrays have the same length n_params
+
+        return
+        ------
+        out : numpy array
+            array of shape (tensor shape) + (n_params,) + (grid shape)
+        """
+
+        kernel = self._kernel(quantity)
+        n_params, coordinates, parameters = self._batch(coordinates, parameters)
+        shape = kernel.shape + self._grid_shape(n_params, coordinates, parameters)
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif out.shape != shape:
+            sys.exit("MetricFamily: out has the wrong shape")
+
+        if workers is None or workers == 1 or n_params == 1:
+            return kernel(*coordinates, chunk_size=chunk_size, out=out, dtype=dtype, **parameters)
+
+        shards = self._shards(n_params, workers)
+        tasks = [(self._token, quantity, self.tensors[quantity], self.coords, self.cse, coordinates,
+                  self._shard(parameters, n_params, shard), chunk_size, out.dtype) for shard in shards]
+        results = map_components(_evaluate_shard, tasks, workers=workers)
+        axis = len(kernel.shape)
+        for shard, result in zip(shards, results):
+            out[(slice(None),) * axis + (shard,)] = result
+
+        return out
+
+    def evaluate_all(self, *coordinates, chunk_size=None, workers=None, dtype=float, **parameters):
+        """Evaluate all quantities of the family, see evaluate.
+
+        return
+        ------
+        results : dict
+            quantity -> array of shape (tensor shape) + (n_params,) + (grid shape)
+        """
+
+        return {quantity: self.evaluate(quantity, *coordinates, chunk_size=chunk_size, workers=workers, dtype=dtype,
+                                        **parameters) for quantity in self.kernels}
+
+    def _kernel(self, quantity):
+        try:
+            return self.kernels[quantity]
+        except KeyError:
+            sys.exit("MetricFamily: quantity " + str(quantity) + " is not part of the family")
+
+    def _batch(self, coordinates, parameters):
+        """Number of parameter points and the coordinates and parameters with the parameter axis in front: coordinates
+        get a leading axis of length 1, 1-dim parameter arrays are reshaped to (n_params, 1, ..., 1).
+        """
+
+        if len(coordinates) != len(self.coords):
+            sys.exit("MetricFamily: expected {} coordinates".format(len(self.coords)))
+        coordinates = [np.asarray(coordinate) for coordinate in coordinates]
+        grid_shape = np.broadcast_shapes(*[coordinate.shape for coordinate in coordinates])
+
+        lengths = set()
+        arrays = {}
+        for name, value in parameters.items():
+            if callable(value):
+                arrays[name] = value
+                continue
+            value = np.asarray(value)
+            if value.ndim > 0:
+                lengths.add(value.shape[0])
+            arrays[name] = value
+        lengths.discard(1)
+        if len(lengths) > 1:
+            sys.exit("MetricFamily: the parameter arrays have different numbers of parameter points")
+        n_params = lengths.pop() if lengths else 1
+
+        coordinates = [coordinate[np.newaxis] for coordinate in coordinates]
+        for name, value in arrays.items():
+            if not callable(value) and value.ndim == 1:
+                arrays[name] = value.reshape((value.shape[0],) + (1,) * len(grid_shape))
+
+        return n_params, coordinates, arrays
+
+    def _grid_shape(self, n_params, coordinates, parameters):
+        """Shape (n_params,) + (grid shape) of the batched coordinates and parameters.
+        """
+
+        shapes = [coordinate.shape for coordinate in coordinates]
+        shapes += [value.shape for value in parameters.values() if not callable(value)]
+        grid_shape = np.broadcast_shapes(*shapes)
+        return (n_params,) + grid_shape[1:]
+
+    def _shards(self, n_params, workers):
+        """Slices of the parameter axis, a few per worker such that the load is balanced.
+        """
+
+        if isinstance(workers, int):
+            count = workers
+        else:
+            count = getattr(workers, "_max_workers", None) or os.cpu_count() or 1
+        count = max(1, min(n_params, 4 * count))
+        bounds = np.linspace(0, n_params, count + 1).astype(int)
+        return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def _shard(self, parameters, n_params, shard):
+        """Parameters of the parameter points in shard.
+        """
+
+        selected = {}
+        for name, value in parameters.items():
+            if not callable(value) and value.ndim > 0 and value.shape[0] == n_params and n_params > 1:
+                value = value[shard]
+            selected[name] = value
+        return selected
+
+
+def _evaluate_shard(token, quantity, tensor, coords, cse, coordinates, parameters, chunk_size, dtype):
+    """Evaluate the kernel of a quantity for a shard of parameter points. The kernel is compiled once per process and
+    family. Worker function for map_components.
+    """
+
+    key = (token, quantity)
+    if key not in _KERNELS:
+        _KERNELS[key] = TensorKernel(tensor, coords=coords, cse=cse)
+    return _KERNELS[key](*coordinates, chunk_size=chunk_size, dtype=dtype, **parameters)
@@ -1,6 +1,18 @@
-import numpy as np
-import sympy as sy
+import functools
+import itertools
 import sys
+from phypylib.simplification import Truncation, resolve as resolve_simplification, truncate
+from phypylib.parallel import map_components, process_pool, spawns_pool
+from phypylib.numerics import TensorKernel
+from phypylib.geodesics import GeodesicIntegrator
+from phypylib.family import MetricFamily
+from phypylib.instrumentation import stage, traced, traced_map, traced_simplify
+from phypylib.cache import load_quantity, quantity_key, store_quantity
+from phypylib.tensor import SymmetricTensor, riemann_symmetries, swap
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+sy = LazyModule("sympy")
 
 class Metric():
     """Create and manipulate a given covariant metric tensor.
@@ -28,9 +40,10 @@ class Metric():
         self.matrix = matrix                                                            # numpy-matrix of the metric tensor
         self.metric = sy.matrices.Matrix([col for col in matrix])                       # sympy-matrix of the metric tensor
         self.metrictensor = sy.Array([col for col in matrix])                           # metric tensor in tensor-like format
-        self.g = self.metric.det()                                                      # determinant of metric tensor
-        self.inv_metric = self.metric.inv()                                             # inverse metric (sympy)
-        self.inv_metrictensor = sy.Array(self.inv_metric)                               # inverse metric (tensor-like)
+        self._blocks = None                                                             # the determinant and the
+        self._g = None                                                                  # inverse metric are only
+        self._inv_metric = None                                                         # calculated on first access,
+        self._inv_metrictensor = None                                                   # see the properties below
         self.t = t                                                                      # time coordinate
         self.x = x                                                                      # first space coordinate
         self.y = y                                                                      # second space coordinate
@@ -41,6 +54,84 @@ class Metric():
         if len(self.coords) is not self.dim:
             sys.exit("dimension of metric and number of spacetime coordinates are not equal")
 
+    @property
+    def blocks(self):
+        """Index blocks of the metric tensor. Two indices belong to the same block if they are coupled by a non-vanishing
+        off-diagonal element, e.g. [[0], [1, 2], [3]] for GraviWave. A diagonal metric consists of 1x1 blocks only.
+        """
+
+        if self._blocks is None:
+            blocks = []
+            unvisited = list(range(self.dim))
+            while unvisited:
+                block = [unvisited.pop(0)]
+                for i in block:                                                         # block grows while iterating
+                    for j in list(unvisited):
+                        if self.metric[i, j] != 0 or self.metric[j, i] != 0:
+                            unvisited.remove(j)
+                            block.append(j)
+                blocks.append(sorted(block))
+            self._blocks = blocks
+        return self._blocks
+
+    @property
+    def g(self):
+        """Determinant of the covariant metric tensor, calculated blockwise on first access.
+        """
+
+        if self._g is None:
+            with stage("determinant", owner=type(self).__name__):
+                factors = []
+                for block in self.blocks:
+                    if len(block) == 1:
+                        factors.append(self.metric[block[0], block[0]])
+                    else:
+                        factors.append(self.metric.extract(block, block).det())
+                self._g = sy.Mul(*factors)
+        return self._g
+
+    @property
+    def inv_metric(self):
+        """Inverse metric (sympy matrix), calculated on first access. Diagonal elements are inverted elementwise and
+        every other block of the metric separately.
+        """
+
+        if self._inv_metric is None:
+            with stage("inverse", owner=type(self).__name__):
+                inv_metric = sy.matrices.zeros(self.dim)
+                for block in self.blocks:
+                    self._invert_block(block, inv_metric)
+                self._inv_metric = inv_metric
+        return self._inv_metric
+
+    def _invert_block(self, block, inv_metric):
+        """Write the inverse of the block of the metric tensor into inv_metric.
+        """
+
+        if len(block) == 1:
+            inv_metric[block[0], block[0]] = 1 / self.metric[block[0], block[0]]
+            return
+        inv_block = self.metric.extract(block, block).inv()
+        for m, i in enumerate(block):
+            for n, j in enumerate(block):
+                inv_metric[i, j] = inv_block[m, n]
+
+    @property
+    def inv_metrictensor(self):
+        """Inverse metric in tensor-like format, calculated on first access.
+        """
+
+        if self._inv_metrictensor is None:
+            self._inv_metrictensor = sy.Array(self.inv_metric)
+        return self._inv_metrictensor
+
+    def simplification(self, simplify):
+        """Strategy used for the calculations on this metric, see phypylib.simplification.resolve. PerturbativeMetric
+        adds the truncation of every component.
+        """
+
+        return resolve_simplification(simplify)
+
     def diff_metric(self, i, j, k):
         """Derivative of the component [i, j] of the metric tensor
 
@@ -70,16 +161,61 @@ class Metric():
 
         return deriv
 
-    def christoffel_symbols(self, retC=True, simplify=True):
+    def metric_derivatives(self, retD=True):
+        """Table of all first derivatives of the metric tensor, dmetric[k][i, j] = partial_k g_{ij}. Every derivative is
+        computed only once, since g_{ij} = g_{ji} the entries with i > j are copied from the ones with i <= j.
+
+        parameter
+        ---------
+        retD : bool
+            if True the table dmetric will be returned
+
+        return
+        ------
+        dmetric : list (if retD=True)
+            list of sympy matrices, dmetric[k] contains the derivatives with respect to the coordinate with index k
+        """
+
+        # check whether the derivatives exist or not
+        try:
+            dmetric = self.dmetric
+        except AttributeError:
+            with stage("derivatives", owner=type(self).__name__):
+                dmetric = [sy.matrices.zeros(self.dim) for k in range(self.dim)]
+                for i in range(self.dim):
+                    for j in range(i, self.dim):
+                        element = self.metric[i, j]
+                        if element.is_number:                                           # constant entries have
+                            continue                                                    # vanishing derivatives
+                        for k in range(self.dim):
+                            deriv = sy.diff(element, self.coords[k])
+                            dmetric[k][i, j] = deriv
+                            dmetric[k][j, i] = deriv
+                self.dmetric = dmetric
+
+        if retD:
+            return dmetric
+
+    @traced("christoffel")
+    def christoffel_symbols(self, retC=True, simplify=True, workers=None):
         """Calculation of all Christoffel symbols
 
+        The Christoffel symbols of the first kind Gamma_{a,ij} = (partial_i g_{ja} + partial_j g_{ia} - partial_a g_{ij})/2
+        are formed once for i <= j from the table of metric derivatives and afterwards raised with the inverse metric,
+        Gamma^k_{ij} = g^{ka} Gamma_{a,ij}. Structurally vanishing terms are skipped, which makes the calculation cheap for
+        (block-)diagonal metrics. Both are kept as SymmetricTensor (self.christoffel_first_kind, self.christoffel), which
+        store only the non-vanishing components with i <= j.
+
         parameter
         ---------
         retC : bool
             if True the list of Christoffel symbols all_symbols will be returned
 
-        simplify : bool
-            if True the sympy.simplify function is used
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used, see phypylib.simplification for cheaper and budgeted strategies
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
 
         return
         ------
@@ -87,57 +223,186 @@ class Metric():
             list containing all Christoffel symbols
         """
 
-        # initialize a list with zero-matrices in the desired shape, such that all_symbols[k]_{ij} = Gamma^k_{ij}
-        all_symbols = []
-        for k in range(self.dim):
-            symbol = sy.matrices.zeros(self.dim)
-            all_symbols.append(symbol)
-
-        # calculate the Christoffel symbols
-        for k in range(self.dim):
-            for i in range(self.dim):
-                for j in range(self.dim):
-                    for a in range(self.dim):
-                        first_deriv = self.diff_metric(j, a, i)
-                        second_deriv = self.diff_metric(i, a, j)
-                        third_deriv = self.diff_metric(i, j, a)
-                        all_symbols[k][i, j] += self.inv_metric[k, a] * (first_deriv + second_deriv - third_deriv) / 2
-
-        # simplify if needed
-        if simplify:
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.christoffel_symbols(retC=retC, simplify=simplify, workers=executor)
+
+        strategy = self.simplification(simplify)
+        inner = strategy.inner() if strategy is not None else None
+        key = quantity_key("christoffel", strategy, self.metric, self.coords)
+        if load_quantity(self, key):
+            if retC:
+                return self.cs
+            return
+        dmetric = self.metric_derivatives(retD=True)
+
+        # Christoffel symbols of the first kind Gamma_{a,ij}, only i <= j is stored
+        indices = []
+        tasks = []
+        for a in range(self.dim):
             for i in range(self.dim):
-                all_symbols[i] = sy.simplify(all_symbols[i])
-
-        # assign them to the class depending on self.dim
-        if self.dim == 2:
-            self.c0 = all_symbols[0]
-            self.c1 = all_symbols[1]
-            self.cs = [self.c0, self.c1]
-        elif self.dim == 3:
-            self.c0 = all_symbols[0]
-            self.c1 = all_symbols[1]
-            self.c2 = all_symbols[2]
-            self.cs = [self.c0, self.c1, self.c2]
-        else:
-            self.c0 = all_symbols[0]
-            self.c1 = all_symbols[1]
-            self.c2 = all_symbols[2]
-            self.c3 = all_symbols[3]
-            self.cs = [self.c0, self.c1, self.c2, self.c3]
+                for j in range(i, self.dim):
+                    terms = [dmetric[i][j, a], dmetric[j][i, a], -dmetric[a][i, j]]
+                    terms = [term / 2 for term in terms if term != 0]
+                    if terms:
+                        indices.append((a, i, j))
+                        tasks.append((terms, inner))
+        lowered = SymmetricTensor(self.dim, 3, [swap(3, 1, 2)])
+        for index, symbol in zip(indices, traced_map("christoffel_first_kind", indices, _sum_component, tasks,
+                                                     workers=workers)):
+            lowered[index] = symbol
+        self.christoffel_first_kind = lowered
+
+        # raise the first index, Gamma^k_{ij} = g^{ka} Gamma_{a,ij}, and simplify if needed
+        christoffel, terms = lowered.contraction_terms(self.inv_metric, 0)
+        indices = sorted(terms)
+        tasks = [(terms[index], strategy) for index in indices]
+        for index, symbol in zip(indices, traced_map("christoffel", indices, _sum_component, tasks, workers=workers)):
+            christoffel[index] = symbol
+        self.christoffel = christoffel
+        store_quantity(self, key, ["christoffel_first_kind", "christoffel"])
 
         if retC:
-            return [symbol for symbol in all_symbols]
+            return self.cs
+
+    @property
+    def cs(self):
+        """Christoffel symbols as list of sympy matrices, cs[k][i, j] = Gamma^k_{ij}, built from self.christoffel. The
+        matrices of single values of k are also available as c0, c1, ... The matrices are built once and shared by all
+        accesses until the Christoffel symbols are calculated again (e.g. by update_component), such that edits of
+        cs[k] or c0 are kept. The calculations of further quantities use self.christoffel and do not see such edits.
+        """
+
+        christoffel = self.christoffel
+        views = self.__dict__.get("_cs_views")
+        if views is None or views[0] is not christoffel:
+            views = (christoffel, [christoffel.matrix(k) for k in range(self.dim)])
+            self._cs_views = views                                                      # source, matrices
+        return views[1]
+
+    def __getattr__(self, name):
+        if name[:1] == "c" and name[1:].isdigit() and int(name[1:]) < self.dim:
+            return self.cs[int(name[1:])]
+        raise AttributeError(name)
 
-    def ricci_tensor(self, retR=True, simplify=True):
-        """Calculation of the Ricci tensor
+    def independent_riemann_components(self):
+        """Index tuples (a, b, c, d) of the algebraically independent components of the covariant Riemann tensor
+        R_{abcd}. With the antisymmetric index pairs P = (a, b), a < b and Q = (c, d), c < d only P <= Q is needed due to
+        the pair symmetry R_{abcd} = R_{cdab}. For four distinct indices i < j < k < l the first Bianchi identity
+        R_{iljk} = R_{ikjl} - R_{ijkl} removes one more component, which leaves dim^2 (dim^2 - 1) / 12 components.
+
+        return
+        ------
+        components : list
+            list of the independent index tuples
+
+        bianchi_components : list
+            list of the index tuples (i, l, j, k) which follow from the first Bianchi identity
+        """
+
+        pairs = [(a, b) for a in range(self.dim) for b in range(a + 1, self.dim)]
+        components = []
+        bianchi_components = []
+        for P in range(len(pairs)):
+            for Q in range(P, len(pairs)):
+                a, b = pairs[P]
+                c, d = pairs[Q]
+                if len({a, b, c, d}) == 4 and b > c and b > d:                          # (i, l, j, k) pattern
+                    bianchi_components.append((a, b, c, d))
+                else:
+                    components.append((a, b, c, d))
+
+        return components, bianchi_components
+
+    @traced("riemann")
+    def riemann_tensor(self, retR=True, simplify=True, workers=None):
+        """Calculation of the covariant Riemann tensor R_{abcd} with R^a_{bcd} = partial_c Gamma^a_{db} - ...,
+        such that the Ricci tensor is R_{bd} = R^a_{bad}. Only the independent components are calculated, using
+        R_{abcd} = partial_c Gamma_{a,db} - partial_d Gamma_{a,cb} + Gamma_{e,da} Gamma^e_{cb} - Gamma_{e,ca} Gamma^e_{db},
+        all other components follow from the symmetries of the SymmetricTensor they are stored in.
+
+        parameter
+        ---------
+        retR : bool
+            if True the function will return the Riemann tensor
+
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used on the independent components, see phypylib.simplification for
+            cheaper and budgeted strategies
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
+
+        return
+        ------
+        riemanntensor : SymmetricTensor (if retR=True)
+            covariant Riemann tensor, riemanntensor[a, b, c, d] = R_{abcd}
+        """
+
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.riemann_tensor(retR=retR, simplify=simplify, workers=executor)
+
+        strategy = self.simplification(simplify)
+        inner = strategy.inner() if strategy is not None else None
+
+        # check whether Christoffel symbols exist or not
+        try:
+            self.christoffel_first_kind
+        except AttributeError:
+            self.christoffel_symbols(retC=False, simplify=inner or False, workers=workers)
+
+        components, bianchi_components = self.independent_riemann_components()
+        riemanntensor = SymmetricTensor(self.dim, 4, riemann_symmetries())
+        tasks = [self._riemann_task(index, strategy) for index in components]
+        for index, component in zip(components, traced_map("riemann", components, _riemann_component, tasks,
+                                                           workers=workers)):
+            riemanntensor[index] = component
+
+        # first Bianchi identity R_{iljk} = R_{ikjl} - R_{ijkl}
+        tasks = [([riemanntensor[i, k, j, l], -riemanntensor[i, j, k, l]], strategy)
+                 for i, l, j, k in bianchi_components]
+        for index, component in zip(bianchi_components, traced_map("riemann", bianchi_components, _sum_component,
+                                                                    tasks, workers=workers)):
+            riemanntensor[index] = component
+
+        self.riemanntensor = riemanntensor
+
+        if retR:
+            return riemanntensor
+
+    def _riemann_task(self, index, strategy):
+        """Arguments of _riemann_component for the independent component index = (a, b, c, d).
+        """
+
+        a, b, c, d = index
+        lowered = self.christoffel_first_kind
+        christoffel = self.christoffel
+        products = []
+        for e in range(self.dim):
+            if lowered[e, d, a] != 0 and christoffel[e, c, b] != 0:
+                products.append(lowered[e, d, a] * christoffel[e, c, b])
+            if lowered[e, c, a] != 0 and christoffel[e, d, b] != 0:
+                products.append(-lowered[e, c, a] * christoffel[e, d, b])
+
+        return lowered[a, d, b], lowered[a, c, b], self.coords[c], self.coords[d], products, strategy
+
+    @traced("ricci_tensor")
+    def ricci_tensor(self, retR=True, simplify=True, workers=None):
+        """Calculation of the Ricci tensor by contracting the Riemann tensor, R_{ac} = g^{db} R_{badc}. Since the Ricci
+        tensor is symmetric only the components with a <= c are calculated, they are kept as SymmetricTensor in
+        self.ricci.
 
         parameter
         ---------
         retR : bool
             if True the function will return the Ricci tensor
 
-        simplify : bool
-            if True the sympy.simplify function is used
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used, see phypylib.simplification for cheaper and budgeted strategies
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
 
         return
         ------
@@ -145,32 +410,42 @@ class Metric():
             Ricci tensor in sympy matrix format
         """
 
-        # check whether Christoffel symbols exist or not
-        try:
-            self.c0
-        except:
-            self.christoffel_symbols(retC=False, simplify=False)
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.ricci_tensor(retR=retR, simplify=simplify, workers=executor)
 
-        # calculate Ricci tensor R_{ac}=R^d_{adc}
-        riccitensor = sy.matrices.zeros(self.dim)
-        for a in range(self.dim):
-            for c in range(self.dim):
-                for d in range(self.dim):
-                    riccitensor[a, c] += sy.diff(self.cs[d][a, c], self.coords[d])
-                    riccitensor[a, c] -= sy.diff(self.cs[d][a, d], self.coords[c])
-                    for e in range(self.dim):
-                        riccitensor[a, c] += self.cs[e][a, c] * self.cs[d][d, e]
-                        riccitensor[a, c] -= self.cs[e][a, d] * self.cs[d][c, e]
+        strategy = self.simplification(simplify)
+        inner = strategy.inner() if strategy is not None else None
+        key = quantity_key("ricci_tensor", strategy, self.metric, self.coords)
+        if load_quantity(self, key):
+            if retR:
+                return self.riccitensor
+            return
 
-        if simplify:
-            riccitensor = sy.simplify(riccitensor)
+        # check whether the Riemann tensor exists or not
+        try:
+            self.riemanntensor
+        except AttributeError:
+            self.riemann_tensor(retR=False, simplify=inner or False, workers=workers)
 
+        # calculate Ricci tensor R_{ac}=R^d_{adc}
+        ricci, terms = self.riemanntensor.trace_terms(self.inv_metric, 0, 2, [swap(2, 0, 1)])
+        indices = sorted(terms)
+        tasks = [(terms[index], strategy) for index in indices]
+        components = traced_map("ricci_tensor", indices, _sum_component, tasks, workers=workers)
+        for index, component in zip(indices, components):
+            ricci[index] = component
+        riccitensor = ricci.matrix()
+
+        self.ricci = ricci
         self.riccitensor = riccitensor
+        store_quantity(self, key, ["ricci", "riccitensor"])
 
         if retR:
             return riccitensor
 
-    def ricci_scalar(self, retR=True, simplify=True):
+    @traced("ricci_scalar")
+    def ricci_scalar(self, retR=True, simplify=True, workers=None):
         """Calculation of the Ricci scalar
 
         parameter
@@ -178,8 +453,11 @@ class Metric():
         retR : bool
             if True the function will return the Ricci scalar
 
-        simplify : bool
-            if True the sympy.simplify function is used
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used, see phypylib.simplification for cheaper and budgeted strategies
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
 
         return
         ------
@@ -187,26 +465,518 @@ class Metric():
             Ricci scalar in sympy matrix format
         """
 
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.ricci_scalar(retR=retR, simplify=simplify, workers=executor)
+
+        strategy = self.simplification(simplify)
+        inner = strategy.inner() if strategy is not None else None
+        key = quantity_key("ricci_scalar", strategy, self.metric, self.coords)
+        if load_quantity(self, key):
+            if retR:
+                return self.ricciscalar
+            return
+
         # Check whether Ricci tensor exists
         try:
             self.riccitensor
-        except:
-            self.ricci_tensor(retR=False, simplify=False)
+        except AttributeError:
+            self.ricci_tensor(retR=False, simplify=inner or False, workers=workers)
 
-        # calculate the Ricci scalar
-        ricciscalar = 0
-        contraction = self.inv_metric * self.riccitensor
-        for i in range(self.dim):
-            ricciscalar += contraction[i, i]
+        # calculate the Ricci scalar R = g^{ac} R_{ac}
+        terms = [self.inv_metric[a, c] * self.riccitensor[a, c] for a in range(self.dim) for c in range(self.dim)
+                 if self.inv_metric[a, c] != 0 and self.riccitensor[a, c] != 0]
+        ricciscalar = sy.Add(*terms)
 
-        if simplify:
-            ricciscalar = sy.simplify(ricciscalar)
+        ricciscalar = traced_simplify("ricci_scalar", ricciscalar, strategy)
 
         self.ricciscalar = ricciscalar
+        store_quantity(self, key, ["ricciscalar"])
 
         if retR:
             return ricciscalar
 
+    @traced("einstein")
+    def einstein_tensor(self, retE=True, simplify=True, workers=None):
+        """Calculation of the Einstein tensor G_{ab} = R_{ab} - g_{ab} R / 2
+
+        parameter
+        ---------
+        retE : bool
+            if True the function will return the Einstein tensor
+
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used, see phypylib.simplification for cheaper and budgeted strategies
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
+
+        return
+        ------
+        einsteintensor : matrix (if retE=True)
+            Einstein tensor in sympy matrix format
+        """
+
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.einstein_tensor(retE=retE, simplify=simplify, workers=executor)
+
+        # Check whether Ricci tensor and Ricci scalar exist
+        try:
+            self.riccitensor
+        except AttributeError:
+            self.ricci_tensor(retR=False, simplify=simplify, workers=workers)
+        try:
+            self.ricciscalar
+        except AttributeError:
+            self.ricci_scalar(retR=False, simplify=simplify, workers=workers)
+
+        strategy = self.simplification(simplify)
+        indices = [(a, b) for a in range(self.dim) for b in range(a, self.dim)]
+        tasks = [([self.riccitensor[a, b], -self.metric[a, b] * self.ricciscalar / 2], strategy) for a, b in indices]
+        einsteintensor = sy.matrices.zeros(self.dim)
+        components = traced_map("einstein", indices, _sum_component, tasks, workers=workers)
+        for (a, b), component in zip(indices, components):
+            einsteintensor[a, b] = component
+            einsteintensor[b, a] = component
+
+        self.einsteintensor = einsteintensor
+
+        if retE:
+            return einsteintensor
+
+    @traced("kretschmann")
+    def kretschmann_scalar(self, retK=True, simplify=True, workers=None):
+        """Calculation of the Kretschmann scalar K = R_{abcd} R^{abcd}. The Riemann tensor is treated as a symmetric
+        matrix R_{PQ} on antisymmetric index pairs P = (a, b), a < b. Raising both indices of a pair is done with the
+        pair metric L^{PE} = g^{ae} g^{bf} - g^{af} g^{be}, E = (e, f), such that K = 4 tr(L R L R).
+
+        parameter
+        ---------
+        retK : bool
+            if True the function will return the Kretschmann scalar
+
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used, see phypylib.simplification for cheaper and budgeted strategies
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
+
+        return
+        ------
+        kretschmannscalar : scalar (if retK=True)
+        """
+
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.kretschmann_scalar(retK=retK, simplify=simplify, workers=executor)
+
+        # check whether the Riemann tensor exists or not
+        try:
+            self.riemanntensor
+        except AttributeError:
+            self.riemann_tensor(retR=False, simplify=simplify, workers=workers)
+
+        pairs = [(a, b) for a in range(self.dim) for b in range(a + 1, self.dim)]
+        inv = self.inv_metric
+        pair_metric = sy.matrices.zeros(len(pairs))
+        pair_riemann = sy.matrices.zeros(len(pairs))
+        for P, (a, b) in enumerate(pairs):
+            for E, (e, f) in enumerate(pairs):
+                pair_metric[P, E] = inv[a, e] * inv[b, f] - inv[a, f] * inv[b, e]
+                pair_riemann[P, E] = self.riemanntensor[a, b, e, f]
+        mixed = pair_metric * pair_riemann                                              # R^{P}_{Q}
+
+        terms = [mixed[P, Q] * mixed[Q, P] for P in range(len(pairs)) for Q in range(len(pairs))
+                 if mixed[P, Q] != 0 and mixed[Q, P] != 0]
+        kretschmannscalar = 4 * sy.Add(*terms)
+
+        strategy = self.simplification(simplify)
+        kretschmannscalar = traced_simplify("kretschmann", kretschmannscalar, strategy)
+
+        self.kretschmannscalar = kretschmannscalar
+
+        if retK:
+            return kretschmannscalar
+
+    def subs(self, substitutions, simplify=True, workers=None):
+        """Metric with substituted parameters, e.g. metric.subs({k: 0}) for the flat FRW metric or metric.subs({a: t**2})
+        for a given scale factor a(t). The quantities calculated so far are taken over: components which do not depend
+        on a substituted symbol or function are reused as they are, only the others are substituted and simplified again,
+        the cheapest first. Since derivatives with respect to the coordinates are already carried out, the coordinates
+        themselves can not be substituted.
+
+        parameter
+        ---------
+        substitutions : dict
+            symbol or undefined function (e.g. a(t)) -> expression. The expression may only depend on the coordinates
+            the replaced function depends on
+
+        simplify : bool or Simplification
+            simplification of the substituted components, see phypylib.simplification
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to substitute and simplify the components in parallel
+
+        return
+        ------
+        metric : Metric
+            new metric of the same class
+        """
+
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.subs(substitutions, simplify=simplify, workers=executor)
+
+        substitutions = {sy.sympify(old): sy.sympify(new) for old, new in dict(substitutions).items()}
+        coords = set(self.coords)
+        for old, new in substitutions.items():
+            if isinstance(old, sy.core.function.AppliedUndef):
+                allowed = old.free_symbols & coords
+            elif isinstance(old, sy.Symbol) and old not in coords:
+                allowed = set()
+            else:
+                sys.exit("subs: only parameters (symbols or undefined functions) can be substituted, not " + str(old))
+            if (new.free_symbols & coords) - allowed:
+                sys.exit("subs: " + str(new) + " depends on coordinates " + str(old) + " does not depend on")
+        keys = list(substitutions)
+        strategy = self.simplification(simplify)
+        inner = strategy.inner() if strategy is not None else None
+
+        matrix = np.array([[_substitute_component(self.metric[i, j], substitutions, None) for j in range(self.dim)]
+                           for i in range(self.dim)], dtype=object)
+        metric = self._substituted(matrix, substitutions)
+
+        # copy every calculated quantity, targets are (container, index) of the components which depend on the keys
+        quantities = {}
+        targets = []
+        tasks = []
+
+        def collect(name, container, indices, component_strategy):
+            quantities[name] = container
+            for index in indices:
+                if container[index].has(*keys):
+                    targets.append((name, index))
+                    tasks.append((container[index], substitutions, component_strategy))
+
+        upper = [(i, j) for i in range(self.dim) for j in range(i, self.dim)]
+        try:
+            dmetric = self.dmetric
+        except AttributeError:
+            dmetric = None
+        if dmetric is not None:
+            for k in range(self.dim):
+                collect("dmetric" + str(k), dmetric[k].copy(), upper, None)
+        if self._inv_metric is not None:
+            collect("_inv_metric", self._inv_metric.copy(), upper, None)
+        for name, component_strategy in [("christoffel_first_kind", inner), ("christoffel", strategy),
+                                         ("riemanntensor", strategy), ("ricci", strategy)]:
+            try:
+                tensor = getattr(self, name).copy()
+            except AttributeError:
+                continue
+            collect(name, tensor, list(tensor.components), component_strategy)
+        try:
+            collect("einsteintensor", self.einsteintensor.copy(), upper, strategy)
+        except AttributeError:
+            pass
+        for name, component_strategy in [("_g", None), ("ricciscalar", strategy), ("kretschmannscalar", strategy)]:
+            value = getattr(self, name, None)
+            if value is not None:
+                collect(name, {(): sy.sympify(value)}, [()], component_strategy)
+
+        indices, tasks = _cheapest_first(targets, tasks)
+        components = traced_map("subs", [(name,) + tuple(index) for name, index in indices], _substitute_component,
+                                tasks, workers=workers)
+        for (name, index), component in zip(indices, components):
+            container = quantities[name]
+            container[index] = component
+            if isinstance(container, sy.MatrixBase):
+                container[index[::-1]] = component                                      # symmetric matrices
+
+        for name, container in quantities.items():
+            if not name.startswith("dmetric"):
+                setattr(metric, name, container[()] if isinstance(container, dict) else container)
+        if dmetric is not None:
+            metric.dmetric = [quantities["dmetric" + str(k)] for k in range(self.dim)]
+        if "ricci" in quantities:
+            metric.riccitensor = metric.ricci.matrix()
+
+        return metric
+
+    def _substituted(self, matrix, substitutions):
+        """New metric of the same class with the substituted matrix, see subs.
+        """
+
+        metric = object.__new__(type(self))
+        Metric.__init__(metric, matrix=matrix, t=self.t, x=self.x, y=self.y, z=self.z)
+        return metric
+
+    def update_component(self, i, j, value, simplify=True, workers=None):
+        """Replace the element g_{ij} = g_{ji} of the metric tensor in place. The quantities calculated so far are updated
+        along their dependencies g_{ij} -> partial_k g_{ij} -> Gamma_{a,ij} -> Gamma^k_{ij} -> R_{abcd} -> R_{ab} -> R:
+        a component is only calculated again if one of the components it is built from has changed, the cheapest first.
+        The inverse metric is only recalculated in the blocks containing i and j. The Einstein tensor and the
+        Kretschmann scalar are discarded and calculated again on demand. Metrics returned by shared_metric are shared,
+        use subs or a new instance to modify them.
+
+        parameter
+        ---------
+        i, j : int
+            indices of the element
+
+        value : sympy expression
+            new value of the element
+
+        simplify : bool or Simplification
+            simplification of the recalculated components, see phypylib.simplification
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to build and simplify the components in parallel
+        """
+
+        if i not in range(self.dim) or j not in range(self.dim):
+            sys.exit("index error in update_component: index out of range")
+        value = sy.sympify(value)
+        if value == self.metric[i, j]:
+            return
+        if spawns_pool(workers):
+            with process_pool(workers) as executor:
+                return self.update_component(i, j, value, simplify=simplify, workers=executor)
+
+        strategy = self.simplification(simplify)
+        inner = strategy.inner() if strategy is not None else None
+
+        old_blocks = self.blocks
+        matrix = np.array(self.matrix, dtype=object)
+        matrix[i, j] = value
+        matrix[j, i] = value
+        self.matrix = matrix
+        self.metric = sy.matrices.Matrix([col for col in matrix])
+        self.metrictensor = sy.Array([col for col in matrix])
+        self._blocks = None
+        self._g = None
+        self._inv_metrictensor = None
+
+        # inverse metric, only the blocks containing i or j change
+        touched = [block for block in old_blocks + self.blocks if i in block or j in block]
+        changed_inverse = set((a, b) for block in touched for a in block for b in block)
+        if self._inv_metric is not None:
+            old_inverse = self._inv_metric
+            inv_metric = old_inverse.copy()
+            for a, b in changed_inverse:
+                inv_metric[a, b] = 0
+            with stage("inverse", owner=type(self).__name__):
+                for block in self.blocks:
+                    if i in block or j in block:
+                        self._invert_block(block, inv_metric)
+            changed_inverse = set((a, b) for a, b in changed_inverse if inv_metric[a, b] != old_inverse[a, b])
+            self._inv_metric = inv_metric
+        if getattr(self, "contravariantpartial", None) is not None:
+            self.contravariantpartial = self.inv_metric
+
+        # metric derivatives, the pairs (p, q), p <= q, whose derivatives changed
+        changed_pairs = set([(min(i, j), max(i, j))])
+        try:
+            dmetric = [matrix.copy() for matrix in self.dmetric]
+        except AttributeError:
+            pass
+        else:
+            for k in range(self.dim):
+                deriv = sy.diff(value, self.coords[k])
+                dmetric[k][i, j] = deriv
+                dmetric[k][j, i] = deriv
+            if all(dmetric[k][i, j] == self.dmetric[k][i, j] for k in range(self.dim)):
+                changed_pairs = set()
+            self.dmetric = dmetric
+
+        # Christoffel symbols of the first kind Gamma_{a,pq}
+        changed_lowered = set()
+        try:
+            lowered = self.christoffel_first_kind.copy()
+        except AttributeError:
+            lowered = None
+        if lowered is not None:
+            dmetric = self.metric_derivatives(retD=True)
+            indices = []
+            tasks = []
+            for a, p, q in itertools.product(range(self.dim), repeat=3):
+                pairs = [(min(q, a), max(q, a)), (min(p, a), max(p, a)), (p, q)]
+                if p > q or not changed_pairs.intersection(pairs):
+                    continue
+                terms = [dmetric[p][q, a], dmetric[q][p, a], -dmetric[a][p, q]]
+                indices.append((a, p, q))
+                tasks.append(([term / 2 for term in terms if term != 0], inner))
+            changed_lowered = _recalculate(lowered, "christoffel_first_kind", indices, _sum_component, tasks, workers)
+            self.christoffel_first_kind = lowered
+
+        # Christoffel symbols Gamma^k_{pq} = g^{ka} Gamma_{a,pq}
+        changed_christoffel = set()
+        try:
+            christoffel = self.christoffel.copy()
+        except AttributeError:
+            christoffel = None
+        if christoffel is None or lowered is None:
+            christoffel = lowered = None
+            self._discard("christoffel_first_kind", "christoffel")
+        else:
+            inv = self.inv_metric
+            indices = []
+            tasks = []
+            for k, p, q in itertools.product(range(self.dim), repeat=3):
+                if p > q or not any((k, a) in changed_inverse or lowered.canonical((a, p, q))[0] in changed_lowered
+                                    for a in range(self.dim)):
+                    continue
+                indices.append((k, p, q))
+                tasks.append(([inv[k, a] * lowered[a, p, q] for a in range(self.dim)
+                               if inv[k, a] != 0 and lowered[a, p, q] != 0], strategy))
+            changed_christoffel = _recalculate(christoffel, "christoffel", indices, _sum_component, tasks, workers)
+            self.christoffel = christoffel
+
+        # Riemann tensor, first the independent components, afterwards the ones from the first Bianchi identity
+        changed_riemann = set()
+        try:
+            riemanntensor = self.riemanntensor.copy()
+        except AttributeError:
+            riemanntensor = None
+        if riemanntensor is None or christoffel is None:
+            riemanntensor = None
+            self._discard("riemanntensor")
+        else:
+            components, bianchi_components = self.independent_riemann_components()
+            indices = []
+            for a, b, c, d in components:
+                inputs = [(lowered, (a, d, b), changed_lowered), (lowered, (a, c, b), changed_lowered)]
+                for e in range(self.dim):
+                    inputs += [(lowered, (e, d, a), changed_lowered), (lowered, (e, c, a), changed_lowered),
+                               (christoffel, (e, c, b), changed_christoffel),
+                               (christoffel, (e, d, b), changed_christoffel)]
+                if any(tensor.canonical(index)[0] in changed for tensor, index, changed in inputs):
+                    indices.append((a, b, c, d))
+            tasks = [self._riemann_task(index, strategy) for index in indices]
+            changed_riemann = _recalculate(riemanntensor, "riemann", indices, _riemann_component, tasks, workers)
+            indices = [(m, n, p, q) for m, n, p, q in bianchi_components
+                       if riemanntensor.canonical((m, q, p, n))[0] in changed_riemann
+                       or riemanntensor.canonical((m, p, q, n))[0] in changed_riemann]
+            tasks = [([riemanntensor[m, q, p, n], -riemanntensor[m, p, q, n]], strategy) for m, n, p, q in indices]
+            changed_riemann |= _recalculate(riemanntensor, "riemann", indices, _sum_component, tasks, workers)
+            self.riemanntensor = riemanntensor
+
+        # Ricci tensor R_{ac} = g^{db} R_{badc}
+        changed_ricci = set()
+        try:
+            ricci = self.ricci.copy()
+        except AttributeError:
+            ricci = None
+        if ricci is None or riemanntensor is None:
+            ricci = None
+            self._discard("ricci", "riccitensor")
+        else:
+            inv = self.inv_metric
+            pairs = [(d, b) for d in range(self.dim) for b in range(self.dim)]
+            indices = [(a, c) for a in range(self.dim) for c in range(a, self.dim)
+                       if any((d, b) in changed_inverse or riemanntensor.canonical((b, a, d, c))[0] in changed_riemann
+                              for d, b in pairs)]
+            tasks = [([inv[d, b] * riemanntensor[b, a, d, c] for d, b in pairs
+                       if inv[d, b] != 0 and riemanntensor[b, a, d, c] != 0], strategy) for a, c in indices]
+            changed_ricci = _recalculate(ricci, "ricci_tensor", indices, _sum_component, tasks, workers)
+            self.ricci = ricci
+            self.riccitensor = ricci.matrix()
+
+        # Ricci scalar
+        if getattr(self, "ricciscalar", None) is not None and (ricci is None or changed_ricci or changed_inverse):
+            self._discard("ricciscalar")
+            if ricci is not None:
+                self.ricci_scalar(retR=False, simplify=simplify, workers=workers)
+
+        self._discard("einsteintensor", "kretschmannscalar", "dalembertoperator")
+
+    def _discard(self, *names):
+        """Remove calculated quantities, they are calculated again on the next access.
+        """
+
+        for name in names:
+            if name in self.__dict__:
+                del self.__dict__[name]
+
+    @traced("dalembert_operator")
+    def dalembert_operator(self, retD=True, simplify=True, form=None, workers=None):
+        """d'Alembert operator of this metric as reusable template, see DalembertOperator. The coefficients
+        g^{mu nu} and b^nu = (1/sqrt|g|) partial_mu (sqrt|g| g^{mu nu}) are calculated once per metric and shared by all
+        fields, e.g. RealScalarField4D.klein_gordon.
+
+        parameter
+        ---------
+        retD : bool
+            if True the operator will be returned
+
+        simplify : bool or Simplification
+            simplification of the coefficients, see phypylib.simplification
+
+        form : None, "divergence" or "christoffel"
+            "divergence": b^nu = partial_mu g^{mu nu} + g^{mu nu} partial_mu g / (2 g) with the determinant g,
+            "christoffel": b^nu = -g^{mu lambda} Gamma^nu_{mu lambda}, None: "christoffel" if the Christoffel symbols
+            have already been calculated, "divergence" otherwise
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to simplify the coefficients in parallel
+
+        return
+        ------
+        dalembertoperator : DalembertOperator (if retD=True)
+        """
+
+        try:
+            dalembertoperator = self.dalembertoperator
+        except AttributeError:
+            if spawns_pool(workers):
+                with process_pool(workers) as executor:
+                    return self.dalembert_operator(retD=retD, simplify=simplify, form=form, workers=executor)
+
+            strategy = self.simplification(simplify)
+            inner = strategy.inner() if strategy is not None else None
+            key = quantity_key("dalembert_operator", strategy, self.metric, self.coords)
+            if not load_quantity(self, key):
+                if form is None:
+                    form = "christoffel" if "christoffel" in self.__dict__ else "divergence"
+                inv = self.inv_metric
+                pairs = [(m, n) for m in range(self.dim) for n in range(self.dim) if inv[m, n] != 0]
+                indices = [(m, n) for m, n in pairs if m <= n]
+                tasks = [([inv[m, n]], strategy) for m, n in indices]
+                if form == "christoffel":
+                    try:
+                        self.christoffel
+                    except AttributeError:
+                        self.christoffel_symbols(retC=False, simplify=inner or False, workers=workers)
+                    for n in range(self.dim):
+                        indices.append((n,))
+                        tasks.append(([-inv[m, l] * self.christoffel[n, m, l] for m, l in pairs
+                                       if self.christoffel[n, m, l] != 0], strategy))
+                elif form == "divergence":
+                    log_derivatives = [sy.diff(self.g, coord) / (2 * self.g) for coord in self.coords]
+                    for n in range(self.dim):
+                        indices.append((n,))
+                        tasks.append(([sy.diff(inv[m, l], self.coords[m]) + inv[m, l] * log_derivatives[m]
+                                       for m, l in pairs if l == n], strategy))
+                else:
+                    sys.exit("dalembert_operator: form is None, 'divergence' or 'christoffel'")
+
+                second = sy.matrices.zeros(self.dim)
+                first = [sy.S.Zero] * self.dim
+                components = traced_map("dalembert_operator", indices, _sum_component, tasks, workers=workers)
+                for index, component in zip(indices, components):
+                    if len(index) == 1:
+                        first[index[0]] = component
+                    else:
+                        second[index] = component
+                        second[index[::-1]] = component
+                self.dalembertoperator = DalembertOperator(second, first, self.coords)
+                store_quantity(self, key, ["dalembertoperator"])
+            dalembertoperator = self.dalembertoperator
+
+        if retD:
+            return dalembertoperator
+
     def covariant_partial(self, retC=True):
         """A general co-/contravariant derivative has the form
         partial = a*partial_0 + b*partial_1 + c*partial_2 + d*partial_3
@@ -262,6 +1032,201 @@ class Metric():
         if retC:
             return contravariantpartial
 
+    def numeric_kernel(self, quantity, simplify=False, cse=True, workers=None):
+        """Compile a calculated quantity into a numpy kernel, see phypylib.numerics.TensorKernel. The kernel is called
+        with one array per coordinate and the remaining free symbols (e.g. Rs) by name and returns an array of shape
+        (tensor shape) + (grid shape).
+
+        parameter
+        ---------
+        quantity : string
+            one of "metric", "inv_metric", "christoffel", "riemann", "ricci_tensor", "ricci_scalar", "einstein",
+            "kretschmann"
+
+        simplify : bool or Simplification
+            simplification used if the quantity has not been calculated yet
+
+        cse : bool
+            if True common subexpressions of all components are eliminated
+
+        workers : None, int or concurrent.futures.Executor
+            used if the quantity has not been calculated yet
+
+        return
+        ------
+        kernel : TensorKernel
+        """
+
+        tensor = self.numeric_tensor(quantity, simplify=simplify, workers=workers)
+        return TensorKernel(tensor, coords=self.coords, cse=cse)
+
+    def numeric_tensor(self, quantity, simplify=False, workers=None):
+        """Symbolic tensor behind numeric_kernel(quantity), calculated if needed.
+
+        return
+        ------
+        tensor : sympy expression, matrix, list of matrices or SymmetricTensor
+        """
+
+        if quantity == "metric":
+            tensor = self.metric
+        elif quantity == "inv_metric":
+            tensor = self.inv_metric
+        elif quantity == "christoffel":
+            try:
+                self.cs
+            except AttributeError:
+                self.christoffel_symbols(retC=False, simplify=simplify, workers=workers)
+            tensor = self.cs
+        elif quantity == "riemann":
+            try:
+                self.riemanntensor
+            except AttributeError:
+                self.riemann_tensor(retR=False, simplify=simplify, workers=workers)
+            tensor = self.riemanntensor
+        elif quantity == "ricci_tensor":
+            try:
+                self.riccitensor
+            except AttributeError:
+                self.ricci_tensor(retR=False, simplify=simplify, workers=workers)
+            tensor = self.riccitensor
+        elif quantity == "ricci_scalar":
+            try:
+                self.ricciscalar
+            except AttributeError:
+                self.ricci_scalar(retR=False, simplify=simplify, workers=workers)
+            tensor = self.ricciscalar
+        elif quantity == "einstein":
+            try:
+                self.einsteintensor
+            except AttributeError:
+                self.einstein_tensor(retE=False, simplify=simplify, workers=workers)
+            tensor = self.einsteintensor
+        elif quantity == "kretschmann":
+            try:
+                self.kretschmannscalar
+            except AttributeError:
+                self.kretschmann_scalar(retK=False, simplify=simplify, workers=workers)
+            tensor = self.kretschmannscalar
+        else:
+            sys.exit("numeric_kernel: unknown quantity " + str(quantity))
+
+        return tensor
+
+    def geodesic_integrator(self, simplify=True, workers=None, **parameters):
+        """Integrator for many geodesics at once, using the compiled Christoffel symbols, see
+        phypylib.geodesics.GeodesicIntegrator.
+
+        parameter
+        ---------
+        simplify : bool or Simplification
+            simplification used if the Christoffel symbols have not been calculated yet
+
+        workers : None, int or concurrent.futures.Executor
+            used if the Christoffel symbols have not been calculated yet
+
+        parameters : numbers
+            values of the free parameters of the metric, e.g. Rs=1
+
+        return
+        ------
+        integrator : GeodesicIntegrator
+        """
+
+        christoffel = self.numeric_kernel("christoffel", simplify=simplify, workers=workers)
+        metric = self.numeric_kernel("metric")
+
+        return GeodesicIntegrator(christoffel, metric, **parameters)
+
+    def family(self, quantities, simplify=True, cse=True, workers=None):
+        """The metric with its free parameters as a family of metrics, whose quantities are calculated and compiled once
+        and evaluated for many parameter points at once, see phypylib.family.MetricFamily.
+
+        parameter
+        ---------
+        quantities : string or list
+            names of the quantities, see numeric_kernel
+
+        simplify : bool or Simplification
+            simplification used for quantities which have not been calculated yet
+
+        cse : bool
+            if True common subexpressions of all components are eliminated
+
+        workers : None, int or concurrent.futures.Executor
+            used for the symbolic calculation of the quantities
+
+        return
+        ------
+        family : MetricFamily
+        """
+
+        return MetricFamily(self, quantities, simplify=simplify, cse=cse, workers=workers)
+
+def _sum_component(terms, strategy):
+    """Sum of the terms of a single component, simplified with strategy if given. Worker function for map_components.
+    """
+
+    component = sy.Add(*terms)
+    if strategy is not None:
+        component = strategy(component)
+    return component
+
+
+def _riemann_component(first, second, coord_c, coord_d, products, strategy):
+    """Single component R_{abcd} = partial_c first - partial_d second + sum(products) of the covariant Riemann tensor.
+    Worker function for map_components.
+    """
+
+    terms = [sy.diff(first, coord_c), -sy.diff(second, coord_d)] + products
+    return _sum_component(terms, strategy)
+
+
+def _substitute_component(expr, substitutions, strategy):
+    """Component with the substitutions applied, derivatives of substituted functions are carried out. Worker function
+    for map_components.
+    """
+
+    component = sy.sympify(expr).subs(substitutions)
+    if component.has(sy.Derivative):
+        component = component.doit()
+    if strategy is not None:
+        component = strategy(component)
+    return component
+
+
+def _cheapest_first(indices, tasks):
+    """Indices and tasks sorted by the op-count of the expressions in the tasks.
+    """
+
+    costs = []
+    for task in tasks:
+        cost = 0
+        for argument in task[:-1]:
+            for expr in argument if isinstance(argument, list) else [argument]:
+                if isinstance(expr, sy.Basic):
+                    cost += sy.count_ops(expr)
+        costs.append(cost)
+    order = sorted(range(len(tasks)), key=costs.__getitem__)
+
+    return [indices[n] for n in order], [tasks[n] for n in order]
+
+
+def _recalculate(tensor, name, indices, function, tasks, workers):
+    """Calculate the components indices of the SymmetricTensor again, the cheapest first, and return the set of canonical
+    indices whose value changed.
+    """
+
+    indices, tasks = _cheapest_first(indices, tasks)
+    changed = set()
+    for index, component in zip(indices, traced_map(name, indices, function, tasks, workers=workers)):
+        if component != tensor[index]:
+            changed.add(tensor.canonical(index)[0])
+            tensor[index] = component
+
+    return changed
+
+
 class MinkowskiMetric(Metric):
     def __init__(self):
         t, x, y, z = sy.symbols("t x y z", real=True)
@@ -280,6 +1245,29 @@ class SchwarzschildMetric(Metric):
         ])
         super(SchwarzschildMetric, self).__init__(matrix=matrix, t=t, x=r, y=theta, z=phi)
 
+    def horizon_event(self, Rs, tolerance=1e-3):
+        """Termination event for GeodesicIntegrator.integrate: geodesics stop once r <= Rs (1 + tolerance), since the
+        coordinates are singular at the horizon.
+
+        parameter
+        ---------
+        Rs : float
+            Schwarzschild radius
+
+        tolerance : float
+            relative distance to the horizon at which the geodesics are stopped
+
+        return
+        ------
+        event : function
+            states -> bool array
+        """
+
+        def event(states):
+            return states[:, 1] <= Rs * (1 + tolerance)
+
+        return event
+
 
 class FRWMetric(Metric):
     def __init__(self):
@@ -336,3 +1324,374 @@ class GraviWave(Metric):
         spatial_dist = x**2 + y**2 + z**2 + Aplus*np.cos(omega*t + phi)*(x**2 - y**2) + 2*Across*np.cos(omega*t + psi)*x*y
 
         return spatial_dist
+
+    def polarization_frames(self, x, y, z, Aplus, Across, omega, phi, psi):
+        """Frame generator for infinitesimal_distance on a fixed spatial grid and many times, see PolarizationFrames.
+
+        parameter
+        ---------
+        x, y, z : float or numpy array
+            spatial coordinates, e.g. from numpy.meshgrid
+
+        Aplus, Across, omega, phi, psi : float
+            see infinitesimal_distance
+
+        return
+        ------
+        frames : PolarizationFrames
+        """
+
+        return PolarizationFrames(x=x, y=y, z=z, Aplus=Aplus, Across=Across, omega=omega, phi=phi, psi=psi)
+
+    def linearized(self, order=1, epsilon=None):
+        """The gravitational wave as PerturbativeMetric g = eta + epsilon h around the Minkowski metric eta, where h
+        contains the amplitudes A_+ and A_x. All quantities are truncated after the given order in epsilon, which marks
+        the order of the amplitudes and can be set to 1 afterwards, e.g. metric.subs({metric.epsilon: 1}).
+
+        parameter
+        ---------
+        order : int
+            highest order in epsilon which is kept
+
+        epsilon : sympy symbol
+            expansion parameter, default: real symbol epsilon
+
+        return
+        ------
+        metric : PerturbativeMetric
+        """
+
+        background = np.diag([1, -1, -1, -1])
+        perturbation = np.array((self.metric - sy.Matrix(background)).tolist(), dtype=object)
+
+        return PerturbativeMetric(background, perturbation, t=self.t, x=self.x, y=self.y, z=self.z, order=order,
+                                  epsilon=epsilon)
+
+
+class PerturbativeMetric(Metric):
+    """Metric g = eta + epsilon h given as background eta and perturbation h, which is treated as power series in
+    epsilon truncated after the given order. Every component of the inverse metric, the Christoffel symbols, the
+    Riemann and Ricci tensor, ... (and of the Klein-Gordon equation of fields on this metric) is truncated as soon as it
+    is built, such that terms of higher order never enter the following steps. The inverse metric is the Neumann series
+    g^{-1} = sum_n (-epsilon eta^{-1} h)^n eta^{-1} up to n = order.
+
+    parameter
+    ---------
+    background : numpy array (n x n)
+        covariant background metric eta, e.g. Minkowski
+
+    perturbation : numpy array (n x n)
+        covariant perturbation h
+
+    t, x, y, z : sympy symbols
+        spacetime coordinates
+
+    order : int
+        highest order in epsilon which is kept
+
+    epsilon : sympy symbol
+        expansion parameter, default: real symbol epsilon
+    """
+
+    def __init__(self, background, perturbation, t, x, y=None, z=None, order=1, epsilon=None):
+        if np.shape(background) != np.shape(perturbation):
+            sys.exit("PerturbativeMetric: background and perturbation need the same shape")
+        if int(order) != order or order < 0:
+            sys.exit("PerturbativeMetric: the order is a non-negative integer")
+        if epsilon is None:
+            epsilon = sy.Symbol("epsilon", real=True)
+
+        self.epsilon = epsilon                                                          # expansion parameter
+        self.order = int(order)                                                         # truncation order
+        self.background = sy.Matrix(np.array(background, dtype=object).tolist())        # eta
+        self.perturbation = sy.Matrix(np.array(perturbation, dtype=object).tolist())    # h
+        matrix = np.array((self.background + epsilon * self.perturbation).tolist(), dtype=object)
+        super(PerturbativeMetric, self).__init__(matrix=matrix, t=t, x=x, y=y, z=z)
+
+    def simplification(self, simplify):
+        """Strategy which truncates every component before it is simplified, see phypylib.simplification.Truncation.
+        """
+
+        strategy = resolve_simplification(simplify)
+        if isinstance(strategy, Truncation):
+            return strategy
+        return Truncation(self.epsilon, self.order, strategy)
+
+    def truncate(self, expr):
+        """Drop the terms of expr of higher order than self.order in epsilon.
+        """
+
+        return truncate(expr, self.epsilon, self.order)
+
+    def _invert_block(self, block, inv_metric):
+        """Neumann series of the inverse of the block.
+        """
+
+        inv_background = self.background.extract(block, block).inv()
+        step = -self.epsilon * inv_background * self.perturbation.extract(block, block)
+        term = inv_background
+        inv_block = inv_background
+        for n in range(self.order):
+            term = step * term
+            inv_block = inv_block + term
+        for m, i in enumerate(block):
+            for n, j in enumerate(block):
+                inv_metric[i, j] = self.truncate(inv_block[m, n])
+
+    def _substituted(self, matrix, substitutions):
+        """Perturbative metric with substituted background and perturbation, an ordinary Metric if epsilon is
+        substituted.
+        """
+
+        if self.epsilon in substitutions:
+            return Metric(matrix=matrix, t=self.t, x=self.x, y=self.y, z=self.z)
+        background, perturbation = [np.array([[_substitute_component(tensor[i, j], substitutions, None)
+                                               for j in range(self.dim)] for i in range(self.dim)], dtype=object)
+                                    for tensor in (self.background, self.perturbation)]
+        metric = object.__new__(type(self))
+        PerturbativeMetric.__init__(metric, background, perturbation, t=self.t, x=self.x, y=self.y, z=self.z,
+                                    order=self.order, epsilon=self.epsilon)
+        return metric
+
+    def update_component(self, i, j, value, simplify=True, workers=None):
+        """Replace the element h_{ij} = h_{ji} of the perturbation in place, see Metric.update_component.
+        """
+
+        if i not in range(self.dim) or j not in range(self.dim):
+            sys.exit("index error in update_component: index out of range")
+        perturbation = self.perturbation.copy()
+        perturbation[i, j] = value
+        perturbation[j, i] = value
+        self.perturbation = perturbation
+        super(PerturbativeMetric, self).update_component(i, j, self.background[i, j] + self.epsilon * value,
+                                                         simplify=simplify, workers=workers)
+
+
+class DalembertOperator():
+    """d'Alembert operator box f = (1/sqrt|g|) partial_mu (sqrt|g| g^{mu nu} partial_nu f)
+    = g^{mu nu} partial_mu partial_nu f + b^nu partial_nu f of a metric as template: the operator is applied once to a
+    placeholder function f(coords) and every field is substituted into this expression, such that the coefficients
+    are calculated and simplified only once (see Metric.dalembert_operator).
+
+    parameter
+    ---------
+    second : sympy matrix (n x n)
+        coefficients g^{mu nu} of the second derivatives
+
+    first : list
+        coefficients b^nu of the first derivatives
+
+    coords : list
+        spacetime coordinates
+    """
+
+    def __init__(self, second, first, coords):
+        self.second = second
+        self.first = list(first)
+        self.coords = list(coords)
+        self.placeholder = sy.Function("f_box")(*self.coords)
+
+        terms = []
+        for m in range(len(self.coords)):
+            for n in range(m, len(self.coords)):
+                if second[m, n] != 0:
+                    factor = 1 if m == n else 2                                         # g^{mn} = g^{nm}
+                    terms.append(factor * second[m, n] * sy.diff(self.placeholder, self.coords[m], self.coords[n]))
+            if self.first[m] != 0:
+                terms.append(self.first[m] * sy.diff(self.placeholder, self.coords[m]))
+        self.expression = sy.Add(*terms)                                                # box f_box
+
+    def __call__(self, field):
+        """box field for a field phi(coords) or any expression of fields, e.g. phi**2.
+        """
+
+        field = sy.sympify(field)
+        if isinstance(field, sy.core.function.AppliedUndef) and list(field.args) == self.coords:
+            return self.expression.xreplace({self.placeholder: field})
+        return self.expression.subs(self.placeholder, field).doit()
+
+    def apply(self, fields, workers=None):
+        """box field for every field of the list.
+
+        parameter
+        ---------
+        fields : list
+            fields phi(coords) or expressions of fields
+
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used for expressions of fields
+
+        return
+        ------
+        boxes : list
+        """
+
+        return map_components(_apply_operator, [(self, field) for field in fields], workers=workers)
+
+
+def _apply_operator(operator, field):
+    """Worker function for map_components.
+    """
+
+    return operator(field)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_metric(metric_class):
+    """Single instance of a predefined metric (MinkowskiMetric, SchwarzschildMetric, FRWMetric, GraviWave), built on
+    the first call and returned by every further call. Quantities calculated on it (inverse, Christoffel symbols, ...)
+    are shared as well, e.g. by all fields using the default metric.
+
+    parameter
+    ---------
+    metric_class : class
+        subclass of Metric without constructor arguments
+
+    return
+    ------
+    metric : Metric
+    """
+
+    return metric_class()
+
+
+class PolarizationFrames():
+    """Time series of GraviWave.infinitesimal_distance on a fixed spatial grid. The distance is split into
+    x^2 + y^2 + z^2 + Aplus cos(omega t + phi) (x^2 - y^2) + 2 Across cos(omega t + psi) x y,
+    the three spatial basis arrays are calculated once and every frame only needs two cosines and two multiply-adds.
+
+    parameter
+    ---------
+    x, y, z : float or numpy array
+        spatial coordinates, broadcasted against each other
+
+    Aplus, Across, omega, phi, psi : float
+        see GraviWave.infinitesimal_distance
+    """
+
+    def __init__(self, x, y, z, Aplus, Across, omega, phi, psi):
+        x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float),
+                                      np.asarray(z, dtype=float))
+        self.radial = x**2 + y**2 + z**2                                                # basis arrays
+        self.plus = x**2 - y**2
+        self.cross = 2*x*y
+        self.shape = self.radial.shape
+        self.Aplus = Aplus
+        self.Across = Across
+        self.omega = omega
+        self.phi = phi
+        self.psi = psi
+
+    def amplitudes(self, times):
+        """Time dependent coefficients of the plus and cross basis arrays.
+
+        parameter
+        ---------
+        times : float or numpy array
+
+        return
+        ------
+        plus, cross : numpy arrays
+        """
+
+        times = np.asarray(times, dtype=float)
+        plus = self.Aplus*np.cos(self.omega*times + self.phi)
+        cross = self.Across*np.cos(self.omega*times + self.psi)
+
+        return plus, cross
+
+    def frame(self, t, out=None):
+        """Single frame at time t, written into out if given.
+
+        parameter
+        ---------
+        t : float
+
+        out : numpy array
+            preallocated output of shape self.shape
+
+        return
+        ------
+        out : numpy array
+        """
+
+        if out is None:
+            out = np.empty(self.shape)
+        plus, cross = self.amplitudes(t)
+        np.multiply(self.plus, plus, out=out)
+        out += self.radial
+        out += cross * self.cross                                                       # temporary, see iter_frames
+
+        return out
+
+    def frames(self, times, out=None, filename=None, chunk=32):
+        """All frames for an array of times as a block of shape (T,) + self.shape.
+
+        parameter
+        ---------
+        times : numpy array (T)
+
+        out : numpy array
+            preallocated output of shape (T,) + self.shape
+
+        filename : string
+            if given (and out is None) the frames are written to a memory-mapped .npy file, which can be opened later
+            with numpy.load(filename, mmap_mode="r")
+
+        chunk : int
+            number of frames calculated at once, this limits the size of the temporary arrays
+
+        return
+        ------
+        out : numpy array or numpy.memmap
+        """
+
+        times = np.asarray(times, dtype=float).reshape(-1)
+        shape = (times.size,) + self.shape
+        if out is None and filename is not None:
+            out = np.lib.format.open_memmap(filename, mode="w+", dtype=float, shape=shape)
+        elif out is None:
+            out = np.empty(shape)
+        elif out.shape != shape:
+            sys.exit("PolarizationFrames: out has the wrong shape")
+
+        plus, cross = self.amplitudes(times)
+        expand = (slice(None),) + (np.newaxis,) * len(self.shape)
+        for start in range(0, times.size, chunk):
+            block = out[start:start + chunk]
+            block[...] = self.radial
+            block += plus[start:start + chunk][expand] * self.plus
+            block += cross[start:start + chunk][expand] * self.cross
+
+        if isinstance(out, np.memmap):
+            out.flush()
+
+        return out
+
+    def iter_frames(self, times, out=None):
+        """Lazily generate the frames for an array of times. The same output buffer is reused for every frame, copy the
+        frame if it is needed after the next one has been generated.
+
+        parameter
+        ---------
+        times : numpy array
+
+        out : numpy array
+            preallocated buffer of shape self.shape
+
+        return
+        ------
+        generator yielding (t, frame)
+        """
+
+        if out is None:
+            out = np.empty(self.shape)
+        scratch = np.empty(self.shape)
+        plus, cross = self.amplitudes(np.asarray(times, dtype=float).reshape(-1))
+        for t, plus_t, cross_t in zip(np.asarray(times, dtype=float).reshape(-1), plus, cross):
+            np.multiply(self.plus, plus_t, out=out)
+            out += self.radial
+            np.multiply(self.cross, cross_t, out=scratch)
+            out += scratch
+            yield t, out
+
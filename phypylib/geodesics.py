@@ -0,0 +1,213 @@
+import sys
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+# Dormand-Prince 5(4) coefficients
+DP_C = [0, 1/5, 3/10, 4/5, 8/9, 1, 1]
+DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+DP_B = [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0]                              # 5th order
+DP_B4 = [5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40]               # 4th order
+DP_E = [b - b4 for b, b4 in zip(DP_B, DP_B4)]                                           # error estimate
+
+
+class GeodesicIntegrator():
+    """Integrate many geodesics at once. The state of N geodesics is a (N, 2 dim) array (x^mu, u^mu = dx^mu/dlambda) and
+    the geodesic equation du^k/dlambda = -Gamma^k_{ij} u^i u^j is evaluated with compiled Christoffel symbols for all
+    geodesics at once.
+
+    parameter
+    ---------
+    christoffel : TensorKernel
+        kernel of the Christoffel symbols, see Metric.numeric_kernel("christoffel")
+
+    metric : TensorKernel
+        kernel of the metric tensor, only needed for null_states
+
+    parameters : numbers
+        values of the parameters of the kernels, e.g. Rs=1
+    """
+
+    def __init__(self, christoffel, metric=None, **parameters):
+        self.christoffel = christoffel
+        self.metric = metric
+        self.dim = christoffel.shape[0]
+        self.parameters = parameters
+
+    def rhs(self, states):
+        """Derivative of the states with respect to the affine parameter.
+
+        parameter
+        ---------
+        states : numpy array (N x 2 dim)
+
+        return
+        ------
+        derivative : numpy array (N x 2 dim)
+        """
+
+        positions = states[:, :self.dim]
+        velocities = states[:, self.dim:]
+        symbols = self.christoffel(*positions.T, **self.parameters)                    # (dim, dim, dim, N)
+        acceleration = -np.einsum("kijn,ni,nj->nk", symbols, velocities, velocities)
+
+        return np.concatenate([velocities, acceleration], axis=1)
+
+    def null_states(self, positions, spatial_velocities):
+        """Initial states of future directed null geodesics. The time component u^0 > 0 is fixed by g_{ij} u^i u^j = 0.
+
+        parameter
+        ---------
+        positions : numpy array (N x dim)
+
+        spatial_velocities : numpy array (N x dim-1)
+            u^1, ..., u^{dim-1}
+
+        return
+        ------
+        states : numpy array (N x 2 dim)
+        """
+
+        if self.metric is None:
+            sys.exit("GeodesicIntegrator: null_states needs the metric kernel")
+        positions = np.asarray(positions, dtype=float)
+        spatial_velocities = np.asarray(spatial_velocities, dtype=float)
+        g = self.metric(*positions.T, **self.parameters)                                # (dim, dim, N)
+
+        # g_00 (u^0)^2 + 2 g_0i u^i u^0 + g_ij u^i u^j = 0
+        a = g[0, 0]
+        b = 2 * np.einsum("in,ni->n", g[0, 1:], spatial_velocities)
+        c = np.einsum("ijn,ni,nj->n", g[1:, 1:], spatial_velocities, spatial_velocities)
+        u0 = (-b + np.sqrt(b**2 - 4 * a * c)) / (2 * a)
+
+        return np.concatenate([positions, u0[:, np.newaxis], spatial_velocities], axis=1)
+
+    def integrate(self, states, lambda_end, step=1e-2, adaptive=False, rtol=1e-6, atol=1e-9, events=(),
+                  max_steps=100000):
+        """Advance all geodesics from the affine parameter 0 to lambda_end.
+
+        parameter
+        ---------
+        states : numpy array (N x 2 dim)
+            initial states
+
+        lambda_end : float
+            final value of the affine parameter (> 0)
+
+        step : float
+            fixed step size (adaptive=False) or initial step size of every geodesic (adaptive=True)
+
+        adaptive : bool
+            False: classical 4th order Runge-Kutta with fixed steps, True: Dormand-Prince 5(4) with a step size control
+            for every single geodesic
+
+        rtol, atol : float
+            relative and absolute tolerance of the adaptive step size control
+
+        events : list
+            functions states -> bool array, a geodesic is terminated as soon as one of them returns True for it, e.g.
+            SchwarzschildMetric.horizon_event
+
+        max_steps : int
+            maximum number of steps
+
+        return
+        ------
+        states : numpy array (N x 2 dim)
+            final states
+
+        affine : numpy array (N)
+            value of the affine parameter each geodesic reached
+
+        status : numpy array (N)
+            0: lambda_end reached or max_steps exceeded, i > 0: terminated by events[i-1], -1: the state diverged
+        """
+
+        states = np.array(states, dtype=float)
+        if states.ndim != 2 or states.shape[1] != 2 * self.dim:
+            sys.exit("GeodesicIntegrator: states need the shape (N, {})".format(2 * self.dim))
+        number = states.shape[0]
+        affine = np.zeros(number)
+        status = np.zeros(number, dtype=int)
+        steps = np.full(number, float(step))
+
+        self._check_events(states, np.arange(number), status, events)
+        active = np.flatnonzero((status == 0) & (affine < lambda_end))
+        for iteration in range(max_steps):
+            if active.size == 0:
+                break
+            y = states[active]
+            h = np.minimum(steps[active], lambda_end - affine[active])
+
+            if adaptive:
+                y_new, error = self._dormand_prince(y, h)
+                scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+                norm = np.sqrt(np.mean((error / scale)**2, axis=1))
+                norm = np.where(np.isfinite(norm), norm, np.inf)
+                accepted = norm <= 1
+                factor = np.clip(0.9 * np.where(norm > 0, norm, 1e-10)**(-0.2), 0.2, 5.0)
+                steps[active] = h * factor
+            else:
+                y_new = self._runge_kutta(y, h)
+                accepted = np.ones(active.size, dtype=bool)
+
+            done = active[accepted]
+            states[done] = y_new[accepted]
+            affine[done] += h[accepted]
+
+            diverged = done[~np.all(np.isfinite(states[done]), axis=1)]
+            status[diverged] = -1
+            if adaptive:
+                tiny = active[~accepted & (steps[active] < 1e-14 * max(1.0, abs(lambda_end)))]
+                status[tiny] = -1                                                       # step size collapsed
+            self._check_events(states[done], done, status, events)
+
+            active = active[(status[active] == 0) & (affine[active] < lambda_end)]
+
+        return states, affine, status
+
+    def _runge_kutta(self, y, h):
+        """Single classical Runge-Kutta step with the step sizes h (one per geodesic).
+        """
+
+        h = h[:, np.newaxis]
+        k1 = self.rhs(y)
+        k2 = self.rhs(y + h * k1 / 2)
+        k3 = self.rhs(y + h * k2 / 2)
+        k4 = self.rhs(y + h * k3)
+
+        return y + h * (k1 + 2 * k2 + 2 * k3 + k4) / 6
+
+    def _dormand_prince(self, y, h):
+        """Single Dormand-Prince step with the step sizes h (one per geodesic), returns the new states and the error
+        estimate.
+        """
+
+        h = h[:, np.newaxis]
+        k = [self.rhs(y)]
+        for stage in range(1, 7):
+            increment = sum(a * k_i for a, k_i in zip(DP_A[stage], k) if a != 0)
+            k.append(self.rhs(y + h * increment))
+        y_new = y + h * sum(b * k_i for b, k_i in zip(DP_B, k) if b != 0)
+        error = h * sum(e * k_i for e, k_i in zip(DP_E, k) if e != 0)
+
+        return y_new, error
+
+    def _check_events(self, states, indices, status, events):
+        """Set the status of the geodesics with the given indices which trigger an event.
+        """
+
+        if indices.size == 0:
+            return
+        for number, event in enumerate(events):
+            triggered = np.asarray(event(states), dtype=bool) & (status[indices] == 0)
+            status[indices[triggered]] = number + 1
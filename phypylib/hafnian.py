@@ -0,0 +1,98 @@
+import itertools
+from math import comb, factorial
+import sys
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+def hafnian(A):
+    """Hafnian of a symmetric matrix (or of a batch of them) with the power trace formula
+    haf(A) = sum_{Z subset of [n]} (-1)^(n - |Z|) f((X A)_Z),
+    where Z runs over the subsets of the n index pairs (2k, 2k+1), X swaps the two rows of every pair and f(C) is the
+    coefficient of x^n in exp(sum_k tr(C^k) x^k / (2k)). This needs O(n^3 2^n) operations for a 2n x 2n matrix instead
+    of summing (2n-1)!! products. The diagonal of A does not contribute.
+
+    parameter
+    ---------
+    A : numpy array (... x 2n x 2n)
+        symmetric matrices, all leading axes are batch axes
+
+    return
+    ------
+    haf : numpy array (...)
+    """
+
+    A = np.asarray(A)
+    if A.ndim < 2 or A.shape[-1] != A.shape[-2]:
+        sys.exit("hafnian: A has to be a (batch of) square matrices")
+    size = A.shape[-1]
+    batch = A.shape[:-2]
+    if size % 2 == 1:
+        return np.zeros(batch, dtype=A.dtype)
+    if size == 0:
+        return np.ones(batch, dtype=A.dtype)
+
+    n = size // 2
+    swap = np.arange(size) ^ 1                                                          # X: 0 <-> 1, 2 <-> 3, ...
+    XA = A[..., swap, :]
+    total = np.zeros(batch, dtype=complex)
+    for r in range(1, n + 1):
+        for subset in itertools.combinations(range(n), r):
+            indices = np.array([2*k + i for k in subset for i in (0, 1)])
+            eigenvalues = np.linalg.eigvals(XA[..., indices[:, np.newaxis], indices])
+            traces = [np.sum(eigenvalues**k, axis=-1) for k in range(1, n + 1)]
+            total += (-1)**(n - r) * _exp_coefficient(traces, n)
+
+    if np.iscomplexobj(A):
+        return total
+    return total.real
+
+
+def _exp_coefficient(traces, n):
+    """Coefficient of x^n in exp(sum_k traces[k-1] x^k / (2k)), vectorized over the batch axes of the traces.
+    """
+
+    q = [trace / (2*k) for k, trace in enumerate(traces, start=1)]
+    e = [np.ones_like(traces[0])]
+    for m in range(1, n + 1):
+        e.append(sum(k * q[k - 1] * e[m - k] for k in range(1, m + 1)) / m)
+    return e[n]
+
+
+def hafnian_repeated(A, repetitions):
+    """Hafnian of the matrix where row and column i of A are repeated repetitions[i] times, with Kan's formula
+    haf = sum_{v_i = 0}^{m_i} (-1)^(sum v) prod_i binom(m_i, v_i) (h^T A h / 2)^s / s!,  h_i = m_i / 2 - v_i,
+    s = sum(m_i) / 2. This needs prod_i (m_i + 1) evaluations of a quadratic form and is much faster than the general
+    hafnian if few fields appear many times. In contrast to hafnian the diagonal of A contributes (self contractions).
+    The alternating sum loses precision for large repetitions.
+
+    parameter
+    ---------
+    A : numpy array (... x k x k)
+        symmetric matrices, all leading axes are batch axes
+
+    repetitions : list of int
+        multiplicities m_i of the k rows
+
+    return
+    ------
+    haf : numpy array (...)
+    """
+
+    A = np.asarray(A)
+    repetitions = list(repetitions)
+    if A.shape[-1] != len(repetitions) or A.shape[-2] != len(repetitions):
+        sys.exit("hafnian_repeated: A needs one row and column per repetition")
+    total = sum(repetitions)
+    if total % 2 == 1:
+        return np.zeros(A.shape[:-2], dtype=A.dtype)
+    s = total // 2
+
+    v = np.array(list(itertools.product(*[range(m + 1) for m in repetitions])), dtype=float)   # (V, k)
+    h = np.array(repetitions, dtype=float) / 2 - v
+    weights = np.array([(-1)**int(row.sum()) * np.prod([comb(m, int(vi)) for m, vi in zip(repetitions, row)])
+                        for row in v], dtype=float)
+    quadratic = np.einsum("vi,...ij,vj->...v", h, A, h) / 2
+
+    return np.einsum("...v,v->...", quadratic**s, weights) / factorial(s)
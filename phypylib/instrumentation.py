@@ -0,0 +1,295 @@
+import functools
+import json
+import logging
+import os
+import time
+from phypylib.parallel import map_components
+from phypylib._lazy import LazyModule
+
+sy = LazyModule("sympy")
+
+
+_SINKS = []                                                                             # active sinks, empty = disabled
+
+
+class Event():
+    """Single instrumentation event.
+
+    parameter
+    ---------
+    kind : string
+        "stage" for a whole step of a calculation (e.g. "inverse", "derivatives", "christoffel", "ricci_tensor"),
+        "component" for a single component of a tensor
+
+    name : string
+        name of the stage or of the quantity the component belongs to
+
+    start : float
+        time.perf_counter() at the start of the event
+
+    duration : float
+        duration in seconds
+
+    pid : int
+        process which did the work, components calculated by a process pool report the pid of the worker
+
+    fields : dict
+        further information, for components: index, build and simplify (durations in seconds), ops_before and ops_after
+        (sympy.count_ops of the component before and after simplification)
+    """
+
+    def __init__(self, kind, name, start, duration, pid, fields):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.pid = pid
+        self.fields = fields
+
+    def __repr__(self):
+        return "Event({}, {}, {:.6f} s, {})".format(self.kind, self.name, self.duration, self.fields)
+
+
+class EventSink():
+    """Base class of the sinks receiving the events. A sink is active while it is used in a with statement (or between
+    add_sink and remove_sink), as long as no sink is active the calculations are not instrumented at all.
+    """
+
+    def emit(self, event):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        add_sink(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_sink(self)
+        self.close()
+        return False
+
+
+class LoggingSink(EventSink):
+    """Write every event to a logger, stages with level and components with component_level.
+
+    parameter
+    ---------
+    logger : logging.Logger
+        default: logging.getLogger("phypylib")
+
+    level, component_level : int
+        logging levels of the stage and component events
+    """
+
+    def __init__(self, logger=None, level=logging.INFO, component_level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger("phypylib")
+        self.level = level
+        self.component_level = component_level
+
+    def emit(self, event):
+        if event.kind == "stage":
+            self.logger.log(self.level, "%s %s: %.3f s", event.fields.get("owner", ""), event.name, event.duration)
+        else:
+            self.logger.log(self.component_level, "%s%s: build %.3f s, simplify %.3f s, ops %d -> %d", event.name,
+                            list(event.fields["index"]), event.fields["build"], event.fields["simplify"],
+                            event.fields["ops_before"], event.fields["ops_after"])
+
+
+class MemorySink(EventSink):
+    """Collect the events in the list events.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def summary(self):
+        """Totals per quantity of the component events.
+
+        return
+        ------
+        summary : dict
+            name -> {"components", "build", "simplify", "ops_before", "ops_after", "slowest"}, where slowest is the
+            index of the component with the longest simplification
+        """
+
+        summary = {}
+        for event in self.events:
+            if event.kind != "component":
+                continue
+            entry = summary.setdefault(event.name, {"components": 0, "build": 0.0, "simplify": 0.0, "ops_before": 0,
+                                                    "ops_after": 0, "slowest": None, "slowest_time": -1.0})
+            entry["components"] += 1
+            for key in ["build", "simplify", "ops_before", "ops_after"]:
+                entry[key] += event.fields[key]
+            if event.fields["simplify"] > entry["slowest_time"]:
+                entry["slowest"] = event.fields["index"]
+                entry["slowest_time"] = event.fields["simplify"]
+        for entry in summary.values():
+            del entry["slowest_time"]
+
+        return summary
+
+
+class ChromeTraceSink(EventSink):
+    """Collect the events and write them as a Chrome trace (load it in chrome://tracing or ui.perfetto.dev) when the
+    sink is closed. Components calculated by a process pool appear in the row of their worker.
+
+    parameter
+    ---------
+    path : string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.trace = []
+
+    def emit(self, event):
+        args = dict(event.fields)
+        if "index" in args:
+            args["index"] = list(args["index"])
+        self.trace.append({"name": event.name if event.kind == "stage" else "{}{}".format(event.name, args["index"]),
+                           "cat": event.kind, "ph": "X", "ts": event.start * 1e6, "dur": event.duration * 1e6,
+                           "pid": os.getpid(), "tid": event.pid, "args": args})
+
+    def close(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"traceEvents": self.trace, "displayTimeUnit": "ms"}, file, default=str)
+        os.replace(temporary, self.path)
+
+
+def add_sink(sink):
+    """Activate a sink.
+    """
+
+    _SINKS.append(sink)
+
+
+def remove_sink(sink):
+    """Deactivate a sink.
+    """
+
+    if sink in _SINKS:
+        _SINKS.remove(sink)
+
+
+def enabled():
+    """True if at least one sink is active.
+    """
+
+    return bool(_SINKS)
+
+
+def emit(event):
+    for sink in list(_SINKS):
+        sink.emit(event)
+
+
+class stage():
+    """Context manager emitting a stage event for the enclosed code, e.g. with stage("inverse", owner="GraviWave").
+    """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if _SINKS:
+            emit(Event("stage", self.name, self.start, time.perf_counter() - self.start, os.getpid(), self.fields))
+        return False
+
+
+def traced(name):
+    """Decorator for methods, which emits a stage event with the class name as owner for every call.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not _SINKS:
+                return method(self, *args, **kwargs)
+            with stage(name, owner=type(self).__name__):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_map(name, indices, function, tasks, workers=None):
+    """phypylib.parallel.map_components with a component event for every task. The last argument of every task has to be
+    the simplification strategy (or None) of function, the component is built with function(*task[:-1], None) and
+    simplified afterwards, such that both steps are timed and the op-count is measured in between. Without active sinks
+    this is map_components.
+
+    parameter
+    ---------
+    name : string
+        name of the quantity
+
+    indices : list
+        index tuple of the component of every task
+
+    function, tasks, workers
+        see map_components
+
+    return
+    ------
+    results : list
+    """
+
+    if not _SINKS:
+        return map_components(function, tasks, workers=workers)
+
+    results = map_components(_measured, [(function, task) for task in tasks], workers=workers)
+    components = []
+    for index, (component, start, pid, fields) in zip(indices, results):
+        fields["index"] = tuple(index)
+        emit(Event("component", name, start, fields["build"] + fields["simplify"], pid, fields))
+        components.append(component)
+
+    return components
+
+
+def traced_simplify(name, expr, strategy, index=()):
+    """Apply the strategy (if not None) to a single expression and emit a component event.
+    """
+
+    if strategy is None:
+        return expr
+    if not _SINKS:
+        return strategy(expr)
+
+    component, start, pid, fields = _measured(_identity, (expr, strategy))
+    fields["index"] = tuple(index)
+    emit(Event("component", name, start, fields["build"] + fields["simplify"], pid, fields))
+
+    return component
+
+
+def _measured(function, task):
+    """Worker function of traced_map, returns the component, the start time, the pid and the measured fields.
+    """
+
+    strategy = task[-1]
+    start = time.perf_counter()
+    raw = function(*task[:-1], None)
+    built = time.perf_counter()
+    component = strategy(raw) if strategy is not None else raw
+    end = time.perf_counter()
+    ops_before = int(sy.count_ops(raw))
+    ops_after = int(sy.count_ops(component)) if strategy is not None else ops_before
+
+    return component, start, os.getpid(), {"build": built - start, "simplify": end - built, "ops_before": ops_before,
+                                           "ops_after": ops_after}
+
+
+def _identity(expr, strategy):
+    return expr
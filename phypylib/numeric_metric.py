@@ -0,0 +1,490 @@
+import sys
+from math import factorial
+from phypylib.instrumentation import stage, traced
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+def stencil_weights(offsets, derivative=1):
+    """Finite difference weights w with sum_j w_j f(x + offsets_j h) = h^derivative f^(derivative)(x) + O(h^(n+1)) for
+    n = len(offsets) - derivative, e.g. [-1/2, 0, 1/2] for the offsets [-1, 0, 1].
+
+    parameter
+    ---------
+    offsets : list of int
+        positions of the stencil points in units of the grid spacing
+
+    derivative : int
+        order of the derivative
+
+    return
+    ------
+    weights : numpy array
+    """
+
+    offsets = np.asarray(offsets, dtype=float)
+    powers = np.arange(len(offsets))
+    vandermonde = offsets[np.newaxis, :] ** powers[:, np.newaxis]
+    rhs = np.zeros(len(offsets))
+    rhs[derivative] = factorial(derivative)
+
+    return np.linalg.solve(vandermonde, rhs)
+
+
+def finite_difference(f, axis, spacing, order=2, periodic=False, out=None):
+    """First derivative of the sampled function f along one axis. Inner points use the central stencil of the given
+    order, the order/2 points at each end one-sided stencils of the same order (or the central stencil wrapped around if
+    periodic). An axis of length 1 is a coordinate the function does not depend on, its derivative vanishes.
+
+    parameter
+    ---------
+    f : numpy array
+
+    axis : int
+        axis of the derivative
+
+    spacing : float
+        grid spacing along the axis
+
+    order : int
+        order of accuracy, 2, 4 or 6
+
+    periodic : bool
+        if True the grid is periodic along the axis
+
+    out : numpy array
+        preallocated result of the same shape as f
+
+    return
+    ------
+    df : numpy array
+        array of the same shape as f
+    """
+
+    length = f.shape[axis]
+    if length == 1:
+        if out is None:
+            return np.zeros(f.shape)
+        out[...] = 0
+        return out
+    if order not in (2, 4, 6):
+        sys.exit("finite_difference: order has to be 2, 4 or 6")
+    half = order // 2
+    weights = stencil_weights(range(-half, half + 1))[half + 1:] / spacing                # antisymmetric, w_-o = -w_o
+
+    def shifted(start, stop):
+        index = [slice(None)] * f.ndim
+        index[axis] = slice(start, stop)
+        return tuple(index)
+
+    df = np.empty(f.shape) if out is None else out
+    if periodic:
+        df[...] = 0
+        for offset, weight in enumerate(weights, start=1):
+            df += weight * (np.roll(f, -offset, axis=axis) - np.roll(f, offset, axis=axis))
+        return df
+
+    if length < order + 1:
+        sys.exit("finite_difference: {} points are too few for a stencil of order {}".format(length, order))
+    inner = df[shifted(half, length - half)]
+    difference = np.empty(inner.shape, dtype=df.dtype)
+    for offset, weight in enumerate(weights, start=1):
+        np.subtract(f[shifted(half + offset, length - half + offset)], f[shifted(half - offset, length - half - offset)],
+                    out=difference)
+        if offset == 1:
+            np.multiply(difference, weight, out=inner)
+        else:
+            difference *= weight
+            inner += difference
+
+    moved_f = np.moveaxis(f, axis, 0)                                                    # one-sided at both ends
+    moved_df = np.moveaxis(df, axis, 0)
+    for i in range(half):
+        moved_df[i] = np.tensordot(stencil_weights(np.arange(order + 1) - i), moved_f[:order + 1], axes=1) / spacing
+        point = length - 1 - i
+        offsets = np.arange(length - 1 - order, length) - point
+        moved_df[point] = np.tensordot(stencil_weights(offsets), moved_f[length - 1 - order:], axes=1) / spacing
+
+    return df
+
+
+def second_difference(f, axis, spacing, order=2, periodic=False, out=None):
+    """Second derivative of the sampled function f along one axis, with the same treatment of the ends as
+    finite_difference. The one-sided stencils at the ends use order + 2 points.
+
+    parameter
+    ---------
+    f : numpy array
+
+    axis : int
+        axis of the derivative
+
+    spacing : float
+        grid spacing along the axis
+
+    order : int
+        order of accuracy, 2, 4 or 6
+
+    periodic : bool
+        if True the grid is periodic along the axis
+
+    out : numpy array
+        preallocated result of the same shape as f
+
+    return
+    ------
+    d2f : numpy array
+        array of the same shape as f
+    """
+
+    length = f.shape[axis]
+    d2f = np.empty(f.shape) if out is None else out
+    if length == 1:
+        d2f[...] = 0
+        return d2f
+    if order not in (2, 4, 6):
+        sys.exit("second_difference: order has to be 2, 4 or 6")
+    half = order // 2
+    weights = stencil_weights(range(-half, half + 1), derivative=2) / spacing**2          # symmetric, w_-o = w_o
+
+    def shifted(start, stop):
+        index = [slice(None)] * f.ndim
+        index[axis] = slice(start, stop)
+        return tuple(index)
+
+    if periodic:
+        np.multiply(f, weights[half], out=d2f)
+        for offset in range(1, half + 1):
+            d2f += weights[half + offset] * (np.roll(f, -offset, axis=axis) + np.roll(f, offset, axis=axis))
+        return d2f
+
+    if length < order + 2:
+        sys.exit("second_difference: {} points are too few for a stencil of order {}".format(length, order))
+    inner = d2f[shifted(half, length - half)]
+    np.multiply(f[shifted(half, length - half)], weights[half], out=inner)
+    difference = np.empty(inner.shape, dtype=d2f.dtype)
+    for offset in range(1, half + 1):
+        np.add(f[shifted(half + offset, length - half + offset)], f[shifted(half - offset, length - half - offset)],
+               out=difference)
+        difference *= weights[half + offset]
+        inner += difference
+
+    moved_f = np.moveaxis(f, axis, 0)                                                    # one-sided at both ends
+    moved_d2f = np.moveaxis(d2f, axis, 0)
+    for i in range(half):
+        moved_d2f[i] = np.tensordot(stencil_weights(np.arange(order + 2) - i, derivative=2), moved_f[:order + 2],
+                                    axes=1) / spacing**2
+        point = length - 1 - i
+        offsets = np.arange(length - 2 - order, length) - point
+        moved_d2f[point] = np.tensordot(stencil_weights(offsets, derivative=2), moved_f[length - 2 - order:],
+                                        axes=1) / spacing**2
+
+    return d2f
+
+
+class NumericMetric():
+    """Metric tensor sampled on a regular grid, e.g. from simulation output. The quantities are calculated with the same
+    conventions as Metric (signature and index placement, R_{ac} = R^d_{adc}), but with finite differences and numpy
+    instead of sympy. All arrays carry the tensor indices first and the grid axes last, e.g. cs[k][i, j] is
+    Gamma^k_{ij} on the whole grid.
+
+    parameter
+    ---------
+    matrix : numpy array (dim x dim x grid)
+        covariant metric tensor at every grid point, the grid has one axis per coordinate. An axis of length 1 marks a
+        coordinate the metric does not depend on (e.g. the time of a static metric)
+
+    spacings : list of float
+        grid spacing of every coordinate
+
+    order : int
+        order of accuracy of the finite differences, 2, 4 or 6
+
+    periodic : bool or list of bool
+        periodic boundaries, for all axes or per axis
+
+    chunk : int
+        default number of grid slices along the first axis processed at once, see christoffel_symbols
+    """
+
+    def __init__(self, matrix, spacings, order=2, periodic=False, chunk=None):
+        matrix = np.asarray(matrix, dtype=float)
+        dim = matrix.shape[0]
+        if matrix.ndim != 2 + dim or matrix.shape[1] != dim:
+            sys.exit("NumericMetric: matrix needs the shape (dim, dim) + grid with one grid axis per coordinate")
+        if len(spacings) != dim:
+            sys.exit("NumericMetric: one spacing per coordinate is needed")
+        if order not in (2, 4, 6):
+            sys.exit("NumericMetric: order has to be 2, 4 or 6")
+        if isinstance(periodic, bool):
+            periodic = [periodic] * dim
+
+        self.dim = dim                                                                  # dimension of spacetime
+        self.matrix = matrix                                                            # metric tensor on the grid
+        self.metric = matrix
+        self.grid_shape = matrix.shape[2:]                                              # shape of the grid
+        self.spacings = [float(spacing) for spacing in spacings]                        # grid spacings
+        self.order = order                                                              # order of the stencils
+        self.periodic = list(periodic)                                                  # periodic axes
+        self.chunk = chunk                                                              # default chunk size
+        self._g = None
+        self._inv_metric = None
+
+    @property
+    def g(self):
+        """Determinant of the metric tensor at every grid point, calculated on first access.
+        """
+
+        if self._g is None:
+            self._g = np.linalg.det(np.moveaxis(self.matrix, (0, 1), (-2, -1)))
+        return self._g
+
+    @property
+    def inv_metric(self):
+        """Inverse metric (dim x dim x grid), calculated on first access with one batched numpy.linalg.inv.
+        """
+
+        if self._inv_metric is None:
+            with stage("inverse", owner=type(self).__name__):
+                self._inv_metric = _inverse(self.matrix)
+        return self._inv_metric
+
+    @property
+    def inv_metrictensor(self):
+        return self.inv_metric
+
+    def metric_derivatives(self, retD=True):
+        """Table of all first derivatives of the metric tensor, dmetric[k][i, j] = partial_k g_{ij}.
+
+        parameter
+        ---------
+        retD : bool
+            if True the table dmetric will be returned
+
+        return
+        ------
+        dmetric : numpy array (dim x dim x dim x grid) (if retD=True)
+        """
+
+        try:
+            dmetric = self.dmetric
+        except AttributeError:
+            with stage("derivatives", owner=type(self).__name__):
+                dmetric = self._derivatives(self.matrix, self.periodic)
+            self.dmetric = dmetric
+
+        if retD:
+            return dmetric
+
+    @traced("christoffel")
+    def christoffel_symbols(self, retC=True, simplify=None, workers=None, chunk=None):
+        """Calculation of all Christoffel symbols Gamma^k_{ij} = g^{ka} Gamma_{a,ij} with the symbols of the first kind
+        Gamma_{a,ij} = (partial_i g_{ja} + partial_j g_{ia} - partial_a g_{ij})/2.
+
+        parameter
+        ---------
+        retC : bool
+            if True the Christoffel symbols will be returned
+
+        simplify, workers
+            accepted for compatibility with Metric and ignored
+
+        chunk : int
+            number of grid slices along the first axis processed at once (default self.chunk), the derivatives of every
+            chunk use a halo of order/2 slices such that the result does not depend on the chunk size. Chunks have at
+            least order + 1 slices, a shorter remainder is merged into the previous chunk. None: the whole grid at once,
+            the derivatives of the metric are kept in self.dmetric
+
+        return
+        ------
+        cs : numpy array (dim x dim x dim x grid) (if retC=True)
+            cs[k][i, j] = Gamma^k_{ij}
+        """
+
+        chunk = chunk if chunk is not None else self.chunk
+        if chunk is None:
+            lowered = _lower_christoffel(self.metric_derivatives(retD=True))
+            cs = np.einsum("ka...,aij...->kij...", self.inv_metric, lowered)
+        else:
+            shape = (self.dim,) * 3 + self.grid_shape
+            lowered = np.empty(shape)
+            cs = np.empty(shape)
+            for target, indices, inner in self._slabs(chunk, self.order // 2):
+                matrix = self.matrix[:, :, indices]
+                slab_lowered = _lower_christoffel(self._derivatives(matrix, [False] + self.periodic[1:]))
+                lowered[:, :, :, target] = slab_lowered[:, :, :, inner]
+                cs[:, :, :, target] = np.einsum("ka...,aij...->kij...", self.inv_metric[:, :, target],
+                                                slab_lowered[:, :, :, inner])
+
+        self.christoffel_first_kind = lowered
+        self.cs = cs
+        for k in range(self.dim):
+            setattr(self, "c{}".format(k), cs[k])
+
+        if retC:
+            return cs
+
+    @traced("ricci_tensor")
+    def ricci_tensor(self, retR=True, simplify=None, workers=None, chunk=None):
+        """Calculation of the Ricci tensor R_{bd} = R^a_{bad}
+        = partial_a Gamma^a_{db} - partial_d Gamma^a_{ab} + Gamma^a_{ae} Gamma^e_{db} - Gamma^a_{de} Gamma^e_{ab}.
+        The derivatives of the Christoffel symbols are only formed contracted, such that no array with four tensor
+        indices is needed.
+
+        parameter
+        ---------
+        retR : bool
+            if True the function will return the Ricci tensor
+
+        simplify, workers
+            accepted for compatibility with Metric and ignored
+
+        chunk : int
+            number of grid slices along the first axis processed at once (default self.chunk). Every chunk is extended
+            by a halo of order slices, the Christoffel symbols of the chunk are recalculated and not stored
+
+        return
+        ------
+        riccitensor : numpy array (dim x dim x grid) (if retR=True)
+        """
+
+        chunk = chunk if chunk is not None else self.chunk
+        if chunk is None:
+            try:
+                self.cs
+            except AttributeError:
+                self.christoffel_symbols(retC=False, chunk=None)
+            riccitensor = self._ricci(self.cs, self.periodic)
+        else:
+            riccitensor = np.empty((self.dim, self.dim) + self.grid_shape)
+            periodic = [False] + self.periodic[1:]
+            for target, indices, inner in self._slabs(chunk, self.order):
+                matrix = self.matrix[:, :, indices]
+                lowered = _lower_christoffel(self._derivatives(matrix, periodic))
+                cs = np.einsum("ka...,aij...->kij...", _inverse(matrix), lowered)
+                riccitensor[:, :, target] = self._ricci(cs, periodic)[:, :, inner]
+
+        self.riccitensor = riccitensor
+
+        if retR:
+            return riccitensor
+
+    @traced("ricci_scalar")
+    def ricci_scalar(self, retR=True, simplify=None, workers=None, chunk=None):
+        """Calculation of the Ricci scalar R = g^{ac} R_{ac}
+
+        parameter
+        ---------
+        retR : bool
+            if True the function will return the Ricci scalar
+
+        simplify, workers
+            accepted for compatibility with Metric and ignored
+
+        chunk : int
+            see ricci_tensor
+
+        return
+        ------
+        ricciscalar : numpy array (grid) (if retR=True)
+        """
+
+        try:
+            self.riccitensor
+        except AttributeError:
+            self.ricci_tensor(retR=False, chunk=chunk)
+
+        ricciscalar = np.einsum("ac...,ac...->...", self.inv_metric, self.riccitensor)
+        self.ricciscalar = ricciscalar
+
+        if retR:
+            return ricciscalar
+
+    @traced("einstein")
+    def einstein_tensor(self, retE=True, simplify=None, workers=None, chunk=None):
+        """Calculation of the Einstein tensor G_{ab} = R_{ab} - g_{ab} R / 2
+
+        parameter
+        ---------
+        retE : bool
+            if True the function will return the Einstein tensor
+
+        simplify, workers
+            accepted for compatibility with Metric and ignored
+
+        chunk : int
+            see ricci_tensor
+
+        return
+        ------
+        einsteintensor : numpy array (dim x dim x grid) (if retE=True)
+        """
+
+        try:
+            self.ricciscalar
+        except AttributeError:
+            self.ricci_scalar(retR=False, chunk=chunk)
+
+        einsteintensor = self.riccitensor - self.matrix * self.ricciscalar / 2
+        self.einsteintensor = einsteintensor
+
+        if retE:
+            return einsteintensor
+
+    def _derivatives(self, matrix, periodic):
+        """dmetric[k][i, j] = partial_k g_{ij} of a metric array (dim x dim x grid).
+        """
+
+        return np.stack([finite_difference(matrix, 2 + k, self.spacings[k], self.order, periodic[k])
+                         for k in range(self.dim)])
+
+    def _ricci(self, cs, periodic):
+        """Ricci tensor from the Christoffel symbols cs (dim x dim x dim x grid).
+        """
+
+        divergence = sum(finite_difference(cs[a], 2 + a, self.spacings[a], self.order, periodic[a])
+                         for a in range(self.dim))                                      # partial_a Gamma^a_{db}
+        contracted = np.einsum("aab...->b...", cs)                                      # Gamma^a_{ab}
+        gradient = np.stack([finite_difference(contracted, 1 + d, self.spacings[d], self.order, periodic[d])
+                             for d in range(self.dim)])                                 # partial_d Gamma^a_{ab}
+        ricci = divergence - gradient + np.einsum("e...,edb...->db...", contracted, cs) \
+            - np.einsum("ade...,eab...->db...", cs, cs)
+
+        return np.swapaxes(ricci, 0, 1)                                                 # [d, b] -> [b, d]
+
+    def _slabs(self, chunk, halo):
+        """Split the first grid axis into chunks. Yields the slice of the chunk, the indices of the chunk extended by the
+        halo (wrapped around for a periodic axis, clipped otherwise) and the slice of the chunk within these indices.
+        Every chunk has at least order + 1 slices, such that the one-sided stencils at the ends of the grid fit into the
+        chunk and its halo. A shorter remainder is merged into the previous chunk.
+        """
+
+        length = self.grid_shape[0]
+        chunk = max(chunk, self.order + 1)
+        starts = list(range(0, length, chunk))
+        if len(starts) > 1 and length - starts[-1] < self.order + 1:
+            starts.pop()                                                                # merge the remainder
+        for start, stop in zip(starts, starts[1:] + [length]):
+            if self.periodic[0] and length > 1:
+                first = start - halo
+                indices = np.arange(first, stop + halo) % length
+            else:
+                first = max(0, start - halo)
+                indices = np.arange(first, min(length, stop + halo))
+            yield slice(start, stop), indices, slice(start - first, stop - first)
+
+
+def _inverse(matrix):
+    """Inverse of a metric array (dim x dim x grid) at every grid point.
+    """
+
+    return np.moveaxis(np.linalg.inv(np.moveaxis(matrix, (0, 1), (-2, -1))), (-2, -1), (0, 1))
+
+
+def _lower_christoffel(dmetric):
+    """Gamma_{a,ij} = (partial_i g_{ja} + partial_j g_{ia} - partial_a g_{ij})/2 from dmetric[k, i, j] = partial_k g_{ij}.
+    """
+
+    grid = tuple(range(3, dmetric.ndim))
+    return (np.transpose(dmetric, (2, 0, 1) + grid) + np.transpose(dmetric, (2, 1, 0) + grid) - dmetric) / 2
@@ -0,0 +1,187 @@
+import sys
+from phypylib.tensor import SymmetricTensor
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+sy = LazyModule("sympy")
+
+
+def flatten_tensor(tensor):
+    """Flatten a symbolic tensor into a list of components.
+
+    parameter
+    ---------
+    tensor : sympy expression, sympy matrix, sympy array, SymmetricTensor or (nested) list of them
+        e.g. the list of Christoffel matrices returned by Metric.christoffel_symbols
+
+    return
+    ------
+    components : list
+        components in C order
+
+    shape : tuple
+        shape of the tensor, () for a scalar
+    """
+
+    if isinstance(tensor, (list, tuple)):
+        flattened = [flatten_tensor(item) for item in tensor]
+        shapes = set(shape for components, shape in flattened)
+        if len(shapes) != 1:
+            sys.exit("flatten_tensor: all entries of the list need the same shape")
+        components = [component for components, shape in flattened for component in components]
+        return components, (len(tensor),) + shapes.pop()
+    if isinstance(tensor, SymmetricTensor):
+        tensor = tensor.dense()
+    if isinstance(tensor, sy.MatrixBase):
+        return [sy.sympify(item) for item in tensor], tensor.shape
+    if isinstance(tensor, sy.NDimArray):
+        return [sy.sympify(item) for item in sy.flatten(tensor)], tensor.shape
+    return [sy.sympify(tensor)], ()
+
+
+def function_placeholders(components):
+    """Replace undefined functions like a(t) and their derivatives by symbols, such that the components can be compiled.
+    Derivative(a(t), (t, 2)) becomes the symbol a_tt.
+
+    parameter
+    ---------
+    components : list
+        list of sympy expressions
+
+    return
+    ------
+    components : list
+        components with the placeholders
+
+    functions : dict
+        name of the placeholder -> replaced function or derivative
+    """
+
+    AppliedUndef = sy.core.function.AppliedUndef
+    replacements = {}
+    for component in components:
+        for derivative in component.atoms(sy.Derivative):
+            if isinstance(derivative.expr, AppliedUndef):
+                name = derivative.expr.func.__name__ + "_" + "".join(str(variable) * count for variable, count
+                                                                     in derivative.variable_count)
+                replacements[derivative] = name
+        for function in component.atoms(AppliedUndef):
+            replacements[function] = function.func.__name__
+
+    symbols = {expr: sy.Symbol(name) for expr, name in replacements.items()}
+    components = [component.xreplace(symbols) for component in components]              # replaces a_t before a
+    functions = {name: expr for expr, name in replacements.items()}
+
+    return components, functions
+
+
+class TensorKernel():
+    """Numpy kernel evaluating all components of a symbolic tensor at once. Common subexpressions of all components are
+    eliminated before the expressions are compiled with sympy.lambdify.
+
+    parameter
+    ---------
+    tensor : sympy expression, matrix, array or list of them
+        symbolic tensor, e.g. metric.christoffel_symbols()
+
+    coords : list
+        sympy symbols of the coordinates, passed positionally to the kernel
+
+    cse : bool
+        if True common subexpressions of all components are eliminated
+
+    Every other free symbol (e.g. Rs or k) and every undefined function (e.g. a(t) in the FRW metric, with placeholders
+    a, a_t, a_tt for its derivatives) becomes a parameter which is passed by name, see self.parameters.
+    """
+
+    def __init__(self, tensor, coords, cse=True):
+        components, self.shape = flatten_tensor(tensor)
+        components, self.functions = function_placeholders(components)
+        self.coords = list(coords)
+
+        coord_names = [str(coord) for coord in self.coords]
+        free_symbols = set().union(*[component.free_symbols for component in components]) - set(self.coords)
+        parameters = sorted([symbol for symbol in free_symbols if str(symbol) not in coord_names], key=str)
+        self.parameters = [str(symbol) for symbol in parameters]                        # names of the parameters
+        if len(set(self.parameters)) != len(self.parameters):
+            sys.exit("TensorKernel: different parameters with the same name")
+
+        # dummies avoid trouble with names which are no valid python identifiers, like A_+
+        arguments = self.coords + parameters
+        dummies = [sy.Dummy() for argument in arguments]
+        components = [component.xreplace(dict(zip(arguments, dummies))) for component in components]
+        self.components = components
+        self.function = sy.lambdify(dummies, components, modules="numpy", cse=cse)
+
+    def __call__(self, *coordinates, chunk_size=None, out=None, dtype=float, **parameters):
+        """Evaluate all components.
+
+        parameter
+        ---------
+        coordinates : arrays
+            one array (or number) for each coordinate, all arrays are broadcasted against each other
+
+        chunk_size : int
+            maximum number of grid points evaluated at once. The grid is split along its first axis
+
+        out : numpy array
+            preallocated output (e.g. a numpy.memmap) of shape self.shape + grid shape
+
+        dtype : numpy dtype
+            dtype of the output if out is not given
+
+        parameters : numbers, arrays or functions
+            values of the parameters by name. Arrays are broadcasted against the coordinates. Placeholders of undefined
+            functions also accept functions, which are called with the coordinates the function depends on
+
+        return
+        ------
+        out : numpy array
+            array of shape self.shape + grid shape with out[index] = component[index] at every grid point
+        """
+
+        if len(coordinates) != len(self.coords):
+            sys.exit("TensorKernel: expected {} coordinates".format(len(self.coords)))
+        missing = [name for name in self.parameters if name not in parameters]
+        if missing:
+            sys.exit("TensorKernel: missing parameters " + ", ".join(missing))
+
+        callables = {name: value for name, value in parameters.items() if callable(value)}
+        values = [np.asarray(coordinate) for coordinate in coordinates]
+        values += [np.asarray(parameters[name]) if name not in callables else np.zeros(())
+                   for name in self.parameters]
+        grid_shape = np.broadcast_shapes(*[value.shape for value in values])
+
+        if out is None:
+            out = np.empty(self.shape + grid_shape, dtype=dtype)
+        elif out.shape != self.shape + grid_shape:
+            sys.exit("TensorKernel: out has the wrong shape")
+        flat_out = out.reshape((-1,) + grid_shape) if self.shape else out[np.newaxis]
+
+        if len(grid_shape) == 0 or chunk_size is None:
+            chunks = [Ellipsis]
+        else:
+            rows = max(1, chunk_size // max(1, int(np.prod(grid_shape[1:]))))
+            chunks = [slice(start, start + rows) for start in range(0, grid_shape[0], rows)]
+
+        for chunk in chunks:
+            broadcasted = [np.broadcast_to(value, grid_shape)[chunk] for value in values]
+            for name, function in callables.items():
+                arguments = [broadcasted[self.coords.index(argument)] for argument in self._function_arguments(name)]
+                broadcasted[len(self.coords) + self.parameters.index(name)] = np.asarray(function(*arguments))
+            results = self.function(*broadcasted)
+            for index, result in enumerate(results):
+                flat_out[index, chunk] = result
+
+        return out
+
+    def _function_arguments(self, name):
+        """Coordinates the undefined function behind the placeholder name depends on.
+        """
+
+        if name not in self.functions:
+            sys.exit("TensorKernel: parameter " + name + " is no function and can not be called")
+        expr = self.functions[name]
+        if isinstance(expr, sy.Derivative):
+            expr = expr.expr
+        return list(expr.args)
@@ -0,0 +1,60 @@
+from concurrent.futures import Executor
+import sys
+
+
+def map_components(function, tasks, workers=None):
+    """Apply function to every task, either serially or spread over a pool of processes. The sympy expressions in the
+    tasks and results are pickled between the processes. The results are returned in the order of the tasks, such that
+    the outcome does not depend on the number of workers or the scheduling.
+
+    parameter
+    ---------
+    function : function
+        module-level (picklable) function, called as function(*task)
+
+    tasks : list
+        list of argument tuples
+
+    workers : None, int or concurrent.futures.Executor
+        None or 1: serial evaluation in the current process, n > 1: a process pool with n processes is created for this
+        call, Executor: the given executor is used (and not shut down)
+
+    return
+    ------
+    results : list
+        function(*task) for every task
+    """
+
+    tasks = list(tasks)
+    if workers is None or workers == 1 or len(tasks) <= 1:
+        return [function(*task) for task in tasks]
+
+    if isinstance(workers, Executor):
+        return list(workers.map(_call, [function] * len(tasks), tasks))
+
+    if not isinstance(workers, int) or workers < 1:
+        sys.exit("map_components: workers has to be None, a positive integer or an Executor")
+
+    from concurrent.futures import ProcessPoolExecutor                                  # imports multiprocessing
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(_call, [function] * len(tasks), tasks))
+
+
+def spawns_pool(workers):
+    """True if workers asks for a new process pool, i.e. it is an integer larger than one.
+    """
+
+    return isinstance(workers, int) and not isinstance(workers, bool) and workers > 1
+
+
+def process_pool(workers):
+    """Process pool with the given number of workers, to be used in a with statement. Calculations which call
+    map_components several times share one pool this way instead of starting a new one for every call.
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _call(function, task):
+    return function(*task)
@@ -1,9 +1,18 @@
-import numpy as np
-import sympy as sy
 import sys
 from phypylib.general_relativity import *
-from collections import Counter
-import ast
+from math import factorial
+from fractions import Fraction
+import itertools
+import json
+import struct
+from phypylib.hafnian import hafnian, hafnian_repeated
+from phypylib.evolution import KleinGordonEvolver
+from phypylib.instrumentation import traced
+from phypylib.cache import load_quantity, quantity_key, store_quantity
+from phypylib._lazy import LazyModule
+
+np = LazyModule("numpy")
+sy = LazyModule("sympy")
 
 
 class Field():
@@ -27,20 +36,25 @@ class RealScalarField4D(Field):
         name of the field
 
     m : sympy symbol
-        symbol for the mass term. Can also be set m=0
+        symbol for the mass term. Can also be set m=0, default: real symbol m
 
     metric : spacetime metric from general_relativity.Metric()
-        specified metric of spacetime
+        specified metric of spacetime, default: the shared MinkowskiMetric (see shared_metric)
 
     # TODO: 3- and 2-dim realscalarfield using this class -> edit MinkowskiMetric()
     """
 
-    def __init__(self, name, m=sy.symbols("m", real=True), metric=MinkowskiMetric()):
+    def __init__(self, name, m=None, metric=None):
         try:
             isinstance(name, str)
         except:
             sys.exit("RealScalarField4D: name variable is a string")
 
+        if m is None:
+            m = sy.Symbol("m", real=True)
+        if metric is None:
+            metric = shared_metric(MinkowskiMetric)
+
         self.m = m                                                                      # mass term
         self.fieldtype = "4-dim real scalar field"                                      # field type
         self.metric = metric                                                            # metric
@@ -52,44 +66,34 @@ class RealScalarField4D(Field):
         field = sy.Function(name, real=True)(t, x, y, z)
         super(RealScalarField4D, self).__init__(field=field, x=x, y=y, z=z, t=t)
 
-    def gr_dalembert_operator(self, retG=True, simplify=True, latex=False):
-        """Calculates the d'Alembert operator acting on the field Nabla_mu*Nabla^mu*field for a given metric.
+    @traced("dalembert")
+    def gr_dalembert_operator(self, retG=True, simplify=True, latex=False, workers=None):
+        """Calculates the d'Alembert operator acting on the field Nabla_mu*Nabla^mu*field for a given metric. The
+        operator (1/sqrt|g|) partial_mu (sqrt|g| g^{mu nu} partial_nu) is calculated once per metric, see
+        Metric.dalembert_operator, and shared by all fields on the same metric.
 
         parameter
         ---------
         retG : bool
             if True the result is returned
 
-        simplify : bool
-            if True the sympy.simplify function is used
+        simplify : bool or Simplification
+            simplification of the coefficients of the operator, used if the operator of the metric has not been
+            calculated yet, see phypylib.simplification for cheaper and budgeted strategies
 
         latex : bool
             if True the result will be printed in latex format
 
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used to simplify the coefficients of the operator in parallel
+
         return
         ------
         dalembert
         """
 
-        covariantpartial = self.metric.covariant_partial(retC=True)
-        contravariantpartial = self.metric.contravariant_partial(retC=True)
-
-        # dalembert acting on phi
-        dalembert = 0
-        for i in range(self.dim):
-            for j in range(self.dim):
-                dalembert += sy.diff(contravariantpartial[i, j]*sy.diff(self.field, self.coords[j]), self.coords[i])
-        if simplify:
-            dalembert = sy.simplify(dalembert)
-
-        # correction term from Christoffel symbols
-        self.metric.christoffel_symbols(retC=False)
-        for i in range(self.dim):
-            for j in range(self.dim):
-                dalembert += self.metric.cs[i][i, j] * contravariantpartial[i, j] * sy.diff(self.field, self.coords[j])
-
-        if simplify:
-            dalembert = sy.simplify(dalembert)
+        dalembertoperator = self.metric.dalembert_operator(retD=True, simplify=simplify, workers=workers)
+        dalembert = dalembertoperator(self.field)
         self.dalembert = dalembert
 
         if latex:
@@ -98,7 +102,8 @@ class RealScalarField4D(Field):
         if retG:
             return dalembert
 
-    def klein_gordon(self, retK=True, simplify=True, latex=False):
+    @traced("klein_gordon")
+    def klein_gordon(self, retK=True, simplify=True, latex=False, workers=None):
         """Calculate the Klein-Gordon equation for a massive real scalar field in 4D using the given metric by initializing
         the field.
 
@@ -107,21 +112,30 @@ class RealScalarField4D(Field):
         retK : bool
             if True the result is returned
 
-        simplify : bool
-            if True the sympy.simplify function is used
+        simplify : bool or Simplification
+            if True the sympy.simplify function is used, see phypylib.simplification for cheaper and budgeted strategies
 
         latex : bool
             if True the result will be printed in latex format
 
+        workers : None, int or concurrent.futures.Executor
+            number of processes (or an executor) used in parallel. The Christoffel symbols are calculated component by
+            component and the coefficients of the derivatives of the field are simplified separately
+
         return
         ------
         kleingordon
             how to read: 0 = kleingordon
         """
-        self.gr_dalembert_operator(retG=False, simplify=simplify, latex=False)
+        key = quantity_key("klein_gordon", self.metric.simplification(simplify), self.metric.metric, self.metric.coords,
+                           self.field, self.m)
+        if not load_quantity(self, key):
+            self.gr_dalembert_operator(retG=False, simplify=simplify, latex=False, workers=workers)
 
-        kleingordon = self.dalembert + self.m**2*self.field
-        self.kleingordon = kleingordon
+            kleingordon = self.dalembert + self.m**2*self.field
+            self.kleingordon = kleingordon
+            store_quantity(self, key, ["dalembert", "kleingordon"])
+        kleingordon = self.kleingordon
 
         if latex:
             sy.print_latex(kleingordon)
@@ -129,9 +143,74 @@ class RealScalarField4D(Field):
         if retK:
             return kleingordon
 
+    def evolver(self, axes, order=2, periodic=False, method="rk4", simplify=True, dtype=float, **parameters):
+        """Numerical time evolution of the Klein-Gordon equation of this field on a spatial grid, see
+        phypylib.evolution.KleinGordonEvolver.
+
+        return
+        ------
+        evolver : KleinGordonEvolver
+        """
+
+        return KleinGordonEvolver(self, axes, order=order, periodic=periodic, method=method, simplify=simplify,
+                                  dtype=dtype, **parameters)
+
+
+def klein_gordon_equations(fields, simplify=True, workers=None):
+    """Klein-Gordon equations of many fields at once, e.g. for a multi-field model. The d'Alembert operator of every
+    metric is calculated once (see Metric.dalembert_operator) and all fields on it are substituted into it, the results
+    are also assigned to the fields (field.dalembert, field.kleingordon).
+
+    parameter
+    ---------
+    fields : list
+        list of RealScalarField4D
+
+    simplify : bool or Simplification
+        simplification of the coefficients of the operators, see phypylib.simplification
+
+    workers : None, int or concurrent.futures.Executor
+        number of processes (or an executor) used to simplify the coefficients in parallel
+
+    return
+    ------
+    kleingordon : list
+        Klein-Gordon equation of every field, how to read: 0 = kleingordon
+    """
+
+    kleingordon = []
+    for field in fields:
+        dalembertoperator = field.metric.dalembert_operator(retD=True, simplify=simplify, workers=workers)
+        field.dalembert = dalembertoperator(field.field)
+        field.kleingordon = field.dalembert + field.m**2*field.field
+        kleingordon.append(field.kleingordon)
+
+    return kleingordon
+
 
 class WickContraction():
-    def __init__(self, fields, mode="console", ignore=None):
+    """Wick contractions of <0|T fields|0>. Fields with the same name are represented by the same integer.
+
+    parameter
+    ---------
+    fields : list
+        list of fields (e.g. RealScalarField4D), only their names are used
+
+    mode : "console", None or sink
+        "console": all contractions are collected and printed, None: nothing is calculated on initialization (use
+        iter_patterns, iter_pairings or stream), sink (e.g. JSONLSink): the contractions are streamed to the sink
+        without being stored
+
+    ignore : None, "vac" or "disconnected"
+        "vac": contractions containing vacuum bubbles (parts without external legs) are dropped, "disconnected": only
+        connected contractions are kept. Fields with the same name form an interaction vertex, the pruning happens
+        while the contractions are enumerated
+
+    external : list
+        names of the fields which are external legs, by default every name which appears only once
+    """
+
+    def __init__(self, fields, mode="console", ignore=None, external=None):
         # Check for even number of fields
         if len(fields) % 2 != 0:
             sys.exit("Wick contractions yields zero since an off number of fields were given.")
@@ -150,81 +229,256 @@ class WickContraction():
         for name in name_str_list:                                                      # throw field-indices in a list
             field_indices.append(dict[name])
         self.field_indices = field_indices
-
+        if ignore not in (None, "vac", "disconnected"):
+            sys.exit("WickContraction: ignore does not support the value: " + str(ignore))
+        self.ignore = ignore
+        if external is None:
+            self.external = set(index for index in field_indices if field_indices.count(index) == 1)
+        else:
+            self.external = set(dict[name] for name in external)
+
+        if mode is None:
+            return
+        if isinstance(mode, ContractionSink):
+            with mode:
+                self.stream(sink=mode)
+            return
         self.contractions(field_indices=field_indices, mode=mode, ignore=ignore)
 
     def contractions(self, field_indices, mode="console", ignore=None):
-        index_list = [i for i in range(len(field_indices))]
-        res = self.pairgroup(index_list=index_list)
-        for i in range(len(res)):
-            for j in range(len(res[i])):
-                res[i][j] = field_indices[res[i][j]]
+        """Collect all distinct contractions of the fields together with their multiplicities. Fields with the same name
+        are interchangeable, hence the contractions are enumerated as distinct patterns over the multiplicities of the
+        names (see contraction_patterns) instead of going through all (2n-1)!! pairings.
+        """
+
+        patterns = sorted(self.contraction_patterns(field_indices=field_indices, ignore=ignore))
+        self.patterns = patterns
+        self.uniqueResList = ["{}".format([list(pair) for pair in pairs]) for pairs, multiplier in patterns]
+        self.multiplierList = [multiplier for pairs, multiplier in patterns]
 
-        self.count_all_multiples(res=res)
+        self.output(mode=mode)
 
-        if ignore is None:
-            self.output(mode=mode)
+    def contraction_patterns(self, field_indices, ignore=None):
+        """Generate every distinct contraction pattern of the fields. A pattern is fixed by the numbers n_ab of
+        contractions between the names a <= b, which have to use up the multiplicity m_a of every name,
+        2 n_aa + sum_{b != a} n_ab = m_a. The number of pairings giving the same pattern is
+        prod_a m_a! / (prod_{a<b} n_ab! prod_a n_aa! 2^n_aa),
+        such that the runtime scales with the number of patterns and not with the number of pairings.
+
+        parameter
+        ---------
+        field_indices : list
+            integer names of the fields, e.g. [1, 2, 3, 3]
 
-        elif ignore == "vac":
-            self.is_graph_connected()
+        ignore : None, "vac" or "disconnected"
+            branches which can only lead to ignored contractions are pruned, see ConnectedComponents
 
+        return
+        ------
+        generator yielding (pairs, multiplier)
+            pairs is a sorted tuple of pairs (a, b) with a <= b, e.g. ((1, 2), (3, 3))
+        """
+
+        names = sorted(set(field_indices))
+        multiplicities = [field_indices.count(name) for name in names]
+        numerator = 1
+        for multiplicity in multiplicities:
+            numerator *= factorial(multiplicity)
+
+        K = len(names)
+        remaining = list(multiplicities)
+        counts = {}
+        components = None
+        if ignore is not None:
+            components = ConnectedComponents(multiplicities, [name in self.external for name in names])
+
+        def fill(a, b):
+            # choose the number of contractions counts[(a, b)] between the names a <= b
+            if a == K:
+                denominator = 1
+                pairs = []
+                for (c, d), n in sorted(counts.items()):
+                    denominator *= factorial(n) * (2**n if c == d else 1)
+                    pairs.extend([(names[c], names[d])] * n)
+                yield tuple(pairs), numerator // denominator
+                return
+            if b == K:
+                if remaining[a] == 0:
+                    yield from fill(a + 1, a + 1)
+                return
+            if b == a:
+                choices = range(remaining[a] // 2 + 1)
+            elif b == K - 1:                                                            # last chance for name a
+                choices = [remaining[a]] if remaining[a] <= remaining[b] else []
+            else:
+                choices = range(min(remaining[a], remaining[b]) + 1)
+            for n in choices:
+                if b == a:
+                    remaining[a] -= 2*n
+                else:
+                    remaining[a] -= n
+                    remaining[b] -= n
+                if remaining[a] <= sum(remaining[b + 1:]):                              # name a can still be used up
+                    doomed = False
+                    if components is not None and n > 0:
+                        root = components.contract(a, b, n)
+                        doomed = components.doomed(root, ignore, sum(remaining))
+                    if not doomed:
+                        counts[(a, b)] = n
+                        yield from fill(a, b + 1)
+                        del counts[(a, b)]
+                    if components is not None and n > 0:
+                        components.undo()
+                if b == a:
+                    remaining[a] += 2*n
+                else:
+                    remaining[a] += n
+                    remaining[b] += n
+
+        yield from fill(0, 0)
+
+    def iter_patterns(self):
+        """Lazily generate the distinct contractions, see contraction_patterns. Only the current pattern is kept in
+        memory.
+
+        return
+        ------
+        generator yielding (pairs, multiplier)
+        """
+
+        return self.contraction_patterns(field_indices=self.field_indices, ignore=self.ignore)
+
+    def iter_pairings(self):
+        """Lazily generate every single pairing of the fields (all (2n-1)!! of them, without the ignored ones) with O(n)
+        memory. A pairing is encoded as the tuple partner of length 2n, where partner[i] is the position of the field
+        contracted with the field at position i.
+
+        return
+        ------
+        generator yielding partner tuples
+        """
+
+        n = len(self.field_indices)
+        partner = [-1] * n
+        stack = []                                                                      # chosen pairs (i, j)
+        components = None
+        if self.ignore is not None:
+            names = sorted(set(self.field_indices))
+            vertex = [names.index(index) for index in self.field_indices]
+            components = ConnectedComponents([self.field_indices.count(name) for name in names],
+                                             [name in self.external for name in names])
+        i, j = 0, 1
+        while True:
+            while j < n and partner[j] != -1:                                           # next free partner of i
+                j += 1
+            if j < n:
+                partner[i] = j
+                partner[j] = i
+                stack.append((i, j))
+                doomed = False
+                if components is not None:
+                    root = components.contract(vertex[i], vertex[j])
+                    doomed = components.doomed(root, self.ignore, n - 2 * len(stack))
+                if not doomed:
+                    if len(stack) < n // 2:
+                        i = partner.index(-1)
+                        j = i + 1
+                        continue
+                    yield tuple(partner)
+                if components is not None:
+                    components.undo()
+                i, j = stack.pop()                                                      # try the next partner of i
+                partner[i] = -1
+                partner[j] = -1
+                j += 1
+                continue
+            if not stack:
+                return
+            i, j = stack.pop()                                                          # backtrack
+            if components is not None:
+                components.undo()
+            partner[i] = -1
+            partner[j] = -1
+            j += 1
+
+    def stream(self, sink, raw=False):
+        """Write the contractions to a sink without storing them.
+
+        parameter
+        ---------
+        sink : ContractionSink
+            e.g. JSONLSink or BinarySink
+
+        raw : bool
+            False: distinct patterns of field names with multipliers, True: every single pairing of field positions
+            (starting at 0) with multiplier 1
+
+        return
+        ------
+        count : int
+            number of written records
+        """
+
+        count = 0
+        if raw:
+            for partner in self.iter_pairings():
+                sink.write(tuple((i, j) for i, j in enumerate(partner) if i < j), 1)
+                count += 1
         else:
-            sys.exit("WickContraction: ignore does not support the value: " + ignore)
-
-    def pairgroup(self, index_list):
-        if len(index_list) == 2:
-            return [[index_list[0], index_list[1]]]
-        pairedList = []
-        startTupleList = self.get_start_tuples(index_list=index_list)
-        for i in range(len(startTupleList)):
-            res = self.pairgroup(startTupleList[i].friends)
-            for j in range(len(res)):
-                res2 = res[j]
-                comboList = []
-                comboList.extend(startTupleList[i].tuple)
-                comboList.extend(res2)
-                pairedList.append(comboList)
-        return pairedList
-
-    def get_start_tuples(self, index_list):
-        startTupleList = []
-        for tupleIndex in range(1, len(index_list)):
-            startTuple = [index_list[0], index_list[tupleIndex]]
-            missingNumsList = []
-            for missingTupleIndex in range(1, len(index_list)):
-                if not missingTupleIndex == tupleIndex:
-                    missingNumsList.append(index_list[missingTupleIndex])
-            tuple = TupleAndMissingFriends(tuple=startTuple, friends=missingNumsList)
-            startTupleList.append(tuple)
-        return startTupleList
-
-    def count_all_multiples(self, res):
-        pairedList = []
-        for pseudo in range(len(res)):
-            pairedList.append([])
-        for i in range(len(res)):
-            for j in range(0, len(res[i]), 2):
-                pairedList[i].append(res[i][j:j+2])
-
-        for item in pairedList:
-            item.sort(key = lambda x: ((x[0], x[1])))
-
-        stringList = []
-        for item in pairedList:
-            stringList.append("{}".format(item))
-        dic = Counter(stringList)
-        uniqueResSet = set(stringList)
-        uniqueResList = list(uniqueResSet)
-        multiplierList = []
-        for item in uniqueResList:
-            multiplier = dic[item]
-            multiplierList.append(multiplier)
-
-        multiplierList.reverse()
-        uniqueResList.reverse()
-
-        self.multiplierList = multiplierList
-        self.uniqueResList = uniqueResList
+            for pairs, multiplier in self.iter_patterns():
+                sink.write(pairs, multiplier)
+                count += 1
+
+        return count
+
+    def evaluate(self, propagator):
+        """Numeric value of <0|T fields|0> for a given propagator without enumerating the contractions. The sum over all
+        pairings is the hafnian of the propagator matrix.
+
+        parameter
+        ---------
+        propagator : numpy array (... x K x K) or (... x 2n x 2n)
+            symmetric propagator matrix, all leading axes are batch axes (e.g. sampled spacetime points). With K the
+            number of distinct names, entry [a, b] is the propagator between the names a+1 and b+1 and the diagonal
+            holds the self contractions. Repeated names are handled by the repeated-row hafnian. With 2n the number of
+            fields, entry [i, j] is the propagator between the fields at the positions i and j
+
+        return
+        ------
+        value : numpy array (...)
+        """
+
+        propagator = np.asarray(propagator)
+        names = sorted(set(self.field_indices))
+        n = len(self.field_indices)
+        if propagator.shape[-1] == len(names) and propagator.shape[-2] == len(names):
+            if self.ignore is not None:
+                return self._evaluate_patterns(propagator, names)
+            repetitions = [self.field_indices.count(name) for name in names]
+            if np.prod([m + 1 for m in repetitions], dtype=float) < 2.0**(n // 2) * n:
+                return hafnian_repeated(propagator, repetitions)
+            indices = [names.index(index) for index in self.field_indices]
+            propagator = propagator[..., indices, :][..., :, indices]
+        elif propagator.shape[-1] != n or propagator.shape[-2] != n:
+            sys.exit("WickContraction: the propagator needs the shape (..., {0}, {0}) or (..., {1}, {1})".format(
+                len(names), n))
+        elif self.ignore is not None:
+            sys.exit("WickContraction: with ignore the propagator has to be given for the names")
+
+        return hafnian(propagator)
+
+    def _evaluate_patterns(self, propagator, names):
+        """Sum over the remaining contraction patterns, used if contractions are ignored.
+        """
+
+        value = np.zeros(propagator.shape[:-2], dtype=propagator.dtype)
+        for pairs, multiplier in self.iter_patterns():
+            term = multiplier * np.ones(propagator.shape[:-2], dtype=propagator.dtype)
+            for a, b in pairs:
+                term = term * propagator[..., names.index(a), names.index(b)]
+            value = value + term
+
+        return value
 
     def output(self, mode="console"):
         if mode == "console":
@@ -240,13 +494,318 @@ class WickContraction():
             print(mode)
 
 
-    def is_graph_connected(self):
-        for graph_str in self.uniqueResList:
-            graph = ast.literal_eval(graph_str)                                         # string to list .. thats kinda silly
-            for tuple in graph:
-                pass # do stuff
+    def is_graph_connected(self, pairs):
+        """Check whether a contraction, e.g. ((1, 2), (3, 3)), connects all fields, where fields with the same name
+        form a vertex.
+
+        parameter
+        ---------
+        pairs : tuple
+            pairs of field names
+
+        return
+        ------
+        connected : bool
+        """
+
+        names = sorted(set(self.field_indices))
+        components = ConnectedComponents([self.field_indices.count(name) for name in names], [False] * len(names))
+        for a, b in pairs:
+            components.contract(names.index(a), names.index(b))
+        roots = set(components.find(a) for a in range(len(names)))
+
+        return len(roots) == 1
+
+
+class ConnectedComponents():
+    """Union-find over the vertices of a contraction with rollback, used to prune the enumeration of Wick contractions.
+    Every component keeps track of its number of open (not yet contracted) fields and whether it contains an external
+    leg. Once a component has no open fields left it is closed and can not change anymore.
+
+    parameter
+    ---------
+    open : list
+        number of fields of every vertex
+
+    external : list
+        bool for every vertex, True for external legs
+    """
+
+    def __init__(self, open, external):
+        self.parent = list(range(len(open)))
+        self.size = [1] * len(open)
+        self.open = list(open)
+        self.external = list(external)
+        self.history = []
+
+    def find(self, a):
+        while self.parent[a] != a:                                                      # no path compression,
+            a = self.parent[a]                                                          # such that undo is possible
+        return a
+
+    def contract(self, a, b, n=1):
+        """Contract n fields of vertex a with n fields of vertex b (a == b is allowed).
+
+        return
+        ------
+        root : int
+            root of the component containing a and b
+        """
+
+        ra = self.find(a)
+        rb = self.find(b)
+        if ra != rb:
+            if self.size[ra] < self.size[rb]:
+                ra, rb = rb, ra
+            self.history.append((ra, rb, n, self.external[ra]))
+            self.parent[rb] = ra
+            self.size[ra] += self.size[rb]
+            self.open[ra] += self.open[rb]
+            self.external[ra] = self.external[ra] or self.external[rb]
+        else:
+            self.history.append((ra, None, n, self.external[ra]))
+        self.open[ra] -= 2 * n
+
+        return ra
+
+    def undo(self):
+        """Revert the last contract.
+        """
+
+        ra, rb, n, external = self.history.pop()
+        self.open[ra] += 2 * n
+        if rb is not None:
+            self.parent[rb] = rb
+            self.size[ra] -= self.size[rb]
+            self.open[ra] -= self.open[rb]
+            self.external[ra] = external
+
+    def doomed(self, root, ignore, total_open):
+        """True if every completion of the current contraction is ignored, because the component of root got closed.
+
+        parameter
+        ---------
+        root : int
+            root returned by contract
+
+        ignore : "vac" or "disconnected"
+
+        total_open : int
+            number of open fields of all components
+        """
+
+        if self.open[root] != 0:
+            return False
+        if ignore == "vac":
+            return not self.external[root]
+        return total_open > 0
+
+
+class FeynmanDiagrams():
+    """Group the contractions of a WickContraction into Feynman diagrams. Every contraction is a multigraph whose
+    vertices are the field names. External legs keep their labels, interaction vertices with the same number of fields
+    are interchangeable. Contractions with isomorphic graphs belong to the same diagram, which is identified by a
+    canonical form of the graph. The contractions are streamed, only one entry per diagram is stored. The canonical forms
+    are memoized by the graph with the interaction vertices sorted by their invariants, such that isomorphic
+    contractions share a memo entry and the memo grows with the number of diagrams, not of contractions.
+
+    The symmetry factor assumes a coupling lambda/d! for every interaction vertex with d fields and a factor 1/k! for k
+    interchangeable vertices, S = prod_c k_c! prod_v d_v! / M, where M is the number of pairings of the diagram.
+
+    parameter
+    ---------
+    wick : WickContraction
+        e.g. WickContraction(fields, mode=None, ignore="disconnected")
+
+    cache : dict
+        memo sorted graph -> canonical form, can be shared between several FeynmanDiagrams of the same fields
+    """
+
+    def __init__(self, wick, cache=None):
+        self.wick = wick
+        self.cache = {} if cache is None else cache
+        self.names = sorted(set(wick.field_indices))
+        self.degree = {name: wick.field_indices.count(name) for name in self.names}
+        self.external = [name for name in self.names if name in wick.external]
+        self.internal = [name for name in self.names if name not in wick.external]
+
+        diagrams = {}                                                                   # canonical form -> entry
+        for pairs, multiplier in wick.iter_patterns():
+            canonical = self.canonical_form(pairs)
+            if canonical not in diagrams:
+                diagrams[canonical] = [pairs, 0, 0]
+            diagrams[canonical][1] += multiplier
+            diagrams[canonical][2] += 1
+
+        numerator = 1
+        for degree, vertices in itertools.groupby(sorted(self.degree[name] for name in self.internal)):
+            numerator *= factorial(len(list(vertices)))
+        for name in self.internal:
+            numerator *= factorial(self.degree[name])
+
+        self.diagrams = []
+        for canonical, (pairs, multiplier, labellings) in diagrams.items():
+            self.diagrams.append({
+                "canonical": canonical,                                                 # canonical form of the graph
+                "pairs": pairs,                                                         # representative contraction
+                "multiplier": multiplier,                                               # number of pairings
+                "labellings": labellings,                                               # number of distinct patterns
+                "symmetry_factor": Fraction(numerator, multiplier),
+            })
+        self.diagrams.sort(key=lambda diagram: diagram["pairs"])
+
+    def adjacency(self, pairs, order):
+        """Adjacency matrix of a contraction with the vertices in the given order, entry [i][i] counts the self
+        contractions of vertex i.
+        """
+
+        position = {name: i for i, name in enumerate(order)}
+        adjacency = [[0] * len(order) for name in order]
+        for a, b in pairs:
+            i, j = sorted((position[a], position[b]))
+            adjacency[i][j] += 1
+            if i != j:
+                adjacency[j][i] += 1
+        return adjacency
+
+    def canonical_form(self, pairs):
+        """Canonical form of the graph of a contraction: the lexicographically smallest upper triangle of the adjacency
+        matrix over all orders of the interaction vertices. Only vertices with the same invariants (number of fields,
+        self contractions, contractions with every external leg and the multiset of contractions with other vertices)
+        are permuted.
+
+        parameter
+        ---------
+        pairs : tuple
+            contraction, e.g. ((1, 3), (2, 3), (3, 3))
+
+        return
+        ------
+        canonical : tuple
+        """
+
+        adjacency = self.adjacency(pairs, self.names)
+        index = {name: i for i, name in enumerate(self.names)}
+
+        def invariant(name):
+            i = index[name]
+            return (self.degree[name], adjacency[i][i], tuple(adjacency[i][index[e]] for e in self.external),
+                    tuple(sorted(adjacency[i][index[w]] for w in self.internal if w != name)))
+
+        cells = {}
+        for name in self.internal:
+            cells.setdefault(invariant(name), []).append(name)
+        cells = [cells[key] for key in sorted(cells)]
+
+        def form(order):
+            matrix = self.adjacency(pairs, order)
+            return tuple(self.degree[name] for name in order), \
+                tuple(matrix[i][j] for i in range(len(order)) for j in range(i, len(order)))
+
+        # the graph with the vertices sorted by their invariants is the same for many isomorphic contractions
+        key = form(self.external + [name for cell in cells for name in cell])
+        canonical = self.cache.get(key)
+        if canonical is not None:
+            return canonical
+
+        for orders in itertools.product(*[itertools.permutations(cell) for cell in cells]):
+            candidate = form(self.external + [name for cell in orders for name in cell])
+            if canonical is None or candidate < canonical:
+                canonical = candidate
+        self.cache[key] = canonical
+
+        return canonical
+
+    def output(self):
+        print("<0|T{}|0> =".format(self.wick.field_indices))
+        print("")
+        for i, diagram in enumerate(self.diagrams):
+            line = "1/{} x {}".format(diagram["symmetry_factor"], [list(pair) for pair in diagram["pairs"]])
+            print(line + (" +" if i != len(self.diagrams) - 1 else ""))
+
+
+class ContractionSink():
+    """Base class of the sinks for WickContraction.stream. Sinks are used in a with statement.
+    """
+
+    def write(self, pairs, multiplier):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class JSONLSink(ContractionSink):
+    """Write every contraction as one line {"pairs": [[1, 2], [3, 3]], "multiplier": 1} to a text file.
+
+    parameter
+    ---------
+    path : string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+
+    def write(self, pairs, multiplier):
+        self.file.write(json.dumps({"pairs": pairs, "multiplier": multiplier}))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class BinarySink(ContractionSink):
+    """Write every contraction as a fixed size little endian record to a binary file. The file starts with the header
+    b"WICK" and the number of pairs per record (uint32), every record consists of the multiplier (uint64) followed by the
+    pairs as int32 values a_1, b_1, a_2, b_2, ...
+
+    parameter
+    ---------
+    path : string
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.record = None
+
+    def write(self, pairs, multiplier):
+        if self.record is None:
+            self.file.write(b"WICK" + struct.pack("<I", len(pairs)))
+            self.record = struct.Struct("<Q" + "i" * (2 * len(pairs)))
+        self.file.write(self.record.pack(multiplier, *[index for pair in pairs for index in pair]))
+
+    def close(self):
+        self.file.close()
+
+    @staticmethod
+    def read(path):
+        """Lazily read the records of a file written by BinarySink.
+
+        return
+        ------
+        generator yielding (pairs, multiplier)
+        """
 
-class TupleAndMissingFriends():
-    def __init__(self, tuple, friends):
-        self.tuple = tuple
-        self.friends = friends
+        with open(path, "rb") as file:
+            header = file.read(8)
+            if len(header) < 8:
+                return
+            if header[:4] != b"WICK":
+                sys.exit("BinarySink: " + path + " is no contraction file")
+            number = struct.unpack("<I", header[4:])[0]
+            record = struct.Struct("<Q" + "i" * (2 * number))
+            while True:
+                data = file.read(record.size)
+                if len(data) < record.size:
+                    return
+                values = record.unpack(data)
+                yield tuple(zip(values[1::2], values[2::2])), values[0]
@@ -0,0 +1,249 @@
+import signal
+import threading
+import time
+import sys
+import warnings
+from phypylib._lazy import LazyModule
+
+sy = LazyModule("sympy")
+
+
+PASSES = {                                                                              # available simplification passes,
+    "simplify": "simplify",                                                             # name -> sympy function
+    "cancel": "cancel",
+    "together": "together",
+    "trigsimp": "trigsimp",
+    "powsimp": "powsimp",
+    "ratsimp": "ratsimp",
+    "radsimp": "radsimp",
+    "factor": "factor",
+    "expand": "expand",
+}
+
+
+class BudgetExceeded(Exception):
+    """Raised internally when the time budget of a single component is used up.
+    """
+
+
+class Simplification():
+    """Strategy to simplify sympy expressions component by component.
+
+    Every component runs through an ordered list of passes. A pass is applied to the best form found so far and its
+    result is only kept if it is not larger with respect to measure. If the time budget of a component is used up, or
+    the component is too large for the remaining passes, the best form found so far is returned.
+
+    parameter
+    ---------
+    passes : list
+        names of the passes (see PASSES) or callables expr -> expr, applied in the given order
+
+    timeout : float
+        time budget per component in seconds. On the main thread of a unix system a running pass is interrupted (this
+        includes the worker processes of workers=n). Otherwise, e.g. in a thread or on Windows, the budget is only
+        checked between the passes, a single pass like "simplify" runs to completion and can take much longer than
+        timeout. A RuntimeWarning is issued in that case
+
+    max_ops : int
+        passes are skipped for components with more than max_ops operations (measured by measure)
+
+    intermediate : bool
+        if True intermediate results (e.g. Christoffel symbols used for the Ricci tensor) are simplified as they are
+        built and not only the requested quantity
+
+    measure : function
+        expr -> number used to compare different forms of a component, None: sympy.count_ops
+    """
+
+    def __init__(self, passes=("cancel", "together", "trigsimp", "powsimp"), timeout=None, max_ops=None,
+                 intermediate=False, measure=None):
+        for simplification_pass in passes:
+            if not callable(simplification_pass) and simplification_pass not in PASSES:
+                sys.exit("Simplification: unknown pass " + str(simplification_pass))
+
+        self.passes = list(passes)
+        self.timeout = timeout
+        self.max_ops = max_ops
+        self.intermediate = intermediate
+        self.measure = measure
+
+    def __repr__(self):
+        names = [p if isinstance(p, str) else getattr(p, "__name__", repr(p)) for p in self.passes]
+        return "Simplification(passes={}, timeout={}, max_ops={}, intermediate={})".format(names, self.timeout,
+                                                                                          self.max_ops,
+                                                                                          self.intermediate)
+
+    def __call__(self, expr):
+        """Simplify a single component.
+
+        parameter
+        ---------
+        expr : sympy expression
+
+        return
+        ------
+        best : sympy expression
+            smallest form of expr found within the budget
+        """
+
+        expr = sy.sympify(expr)
+        if expr.is_number and expr.is_Atom:                                             # nothing to do for 0, 1, ...
+            return expr
+
+        measure = self.measure if self.measure is not None else sy.count_ops
+        best = expr
+        best_size = measure(expr)
+        start = time.perf_counter()
+        try:
+            with _alarm(self.timeout):
+                for simplification_pass in self.passes:
+                    if self.timeout is not None and time.perf_counter() - start >= self.timeout:
+                        break
+                    if self.max_ops is not None and best_size > self.max_ops:
+                        break
+                    function = getattr(sy, PASSES[simplification_pass]) if isinstance(simplification_pass, str) \
+                        else simplification_pass
+                    candidate = function(best)
+                    size = measure(candidate)
+                    if size <= best_size:
+                        best, best_size = candidate, size
+        except BudgetExceeded:
+            pass
+
+        return best
+
+    def inner(self):
+        """Strategy for intermediate results: self if intermediate=True, else None.
+        """
+
+        if self.intermediate:
+            return self
+        return None
+
+
+class Truncation(Simplification):
+    """Strategy for perturbative calculations: every component is truncated after the given order in epsilon (see
+    truncate) before it is simplified with strategy, such that terms of higher order never enter the following steps.
+
+    parameter
+    ---------
+    epsilon : sympy symbol
+        expansion parameter
+
+    order : int
+        highest power of epsilon which is kept
+
+    strategy : Simplification or None
+        simplification applied after the truncation
+    """
+
+    def __init__(self, epsilon, order, strategy=None):
+        if strategy is None:
+            super(Truncation, self).__init__(passes=())
+        else:
+            super(Truncation, self).__init__(passes=strategy.passes, timeout=strategy.timeout,
+                                             max_ops=strategy.max_ops, intermediate=strategy.intermediate,
+                                             measure=strategy.measure)
+        self.epsilon = epsilon
+        self.order = order
+        self.strategy = strategy
+
+    def __repr__(self):
+        return "Truncation(epsilon={}, order={}, strategy={})".format(self.epsilon, self.order, self.strategy)
+
+    def __call__(self, expr):
+        expr = truncate(expr, self.epsilon, self.order)
+        if self.strategy is not None:
+            expr = self.strategy(expr)
+        return expr
+
+    def inner(self):
+        """Intermediate results are always truncated, but only simplified if strategy.intermediate is True.
+        """
+
+        return Truncation(self.epsilon, self.order, self.strategy.inner() if self.strategy is not None else None)
+
+
+def truncate(expr, epsilon, order):
+    """Drop all terms of expr of higher order than order in epsilon. Polynomials in epsilon are truncated term by
+    term, other expressions are expanded with sympy.series.
+
+    parameter
+    ---------
+    expr : sympy expression
+
+    epsilon : sympy symbol
+
+    order : int
+
+    return
+    ------
+    truncated : sympy expression
+    """
+
+    expr = sy.sympify(expr)
+    if not expr.has(epsilon):
+        return expr
+    try:
+        polynomial = sy.Poly(expr, epsilon)
+    except sy.PolynomialError:
+        return sy.series(expr, epsilon, 0, order + 1).removeO()
+    return sy.Add(*[coefficient * epsilon**power for (power,), coefficient in polynomial.terms() if power <= order])
+
+
+FULL = Simplification(passes=("simplify",))                                             # behaviour of simplify=True
+CHEAP = Simplification(passes=("cancel", "together", "trigsimp", "powsimp"))            # fast passes only
+
+
+def resolve(simplify):
+    """Translate the simplify argument of the calculation methods into a strategy.
+
+    parameter
+    ---------
+    simplify : bool or Simplification or list
+        False/None: no simplification, True: sympy.simplify on every component, list: names of passes
+
+    return
+    ------
+    strategy : Simplification or None
+    """
+
+    if simplify is None or simplify is False:
+        return None
+    if simplify is True:
+        return FULL
+    if isinstance(simplify, Simplification):
+        return simplify
+    if isinstance(simplify, (list, tuple)):
+        return Simplification(passes=simplify)
+    sys.exit("Simplification: simplify has to be a bool, a list of passes or a Simplification")
+
+
+class _alarm():
+    """Context manager interrupting the enclosed code with BudgetExceeded after the given number of seconds. Only
+    active on the main thread of systems providing signal.setitimer, otherwise a RuntimeWarning is issued.
+    """
+
+    def __init__(self, seconds):
+        self.active = seconds is not None and hasattr(signal, "setitimer") \
+            and threading.current_thread() is threading.main_thread()
+        self.seconds = seconds
+        if seconds is not None and not self.active:
+            warnings.warn("Simplification: the timeout can only interrupt a pass on the main thread of a unix system, "
+                          "here it is checked between the passes", RuntimeWarning, stacklevel=3)
+
+    def __enter__(self):
+        if self.active:
+            self.previous = signal.signal(signal.SIGALRM, _raise_budget_exceeded)
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        return self
+
+    def __exit__(self, *exc):
+        if self.active:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previous)
+        return False
+
+
+def _raise_budget_exceeded(signum, frame):
+    raise BudgetExceeded()
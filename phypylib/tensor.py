@@ -0,0 +1,264 @@
+import itertools
+import sys
+from phypylib._lazy import LazyModule
+
+sy = LazyModule("sympy")
+
+
+def swap(rank, i, j, sign=1):
+    """Symmetry under the exchange of the indices i and j, sign=-1 for an antisymmetric pair.
+
+    return
+    ------
+    symmetry : tuple
+        (permutation, sign), see SymmetricTensor
+    """
+
+    permutation = list(range(rank))
+    permutation[i], permutation[j] = j, i
+    return tuple(permutation), sign
+
+
+def riemann_symmetries():
+    """Symmetries of the covariant Riemann tensor R_{abcd} = -R_{bacd} = -R_{abdc} = R_{cdab}.
+    """
+
+    return [swap(4, 0, 1, -1), swap(4, 2, 3, -1), ((2, 3, 0, 1), 1)]
+
+
+class SymmetricTensor():
+    """Sparse tensor of arbitrary rank and dimension, which stores only the non-vanishing components that are
+    independent under the declared index symmetries. Every index tuple is mapped to the smallest tuple of its orbit
+    under the symmetries (the canonical index) and a sign, components whose orbit contains the tuple itself with both
+    signs vanish identically (e.g. R_{aacd}). Components are read and written with full index tuples, T[a, b, c].
+
+    parameter
+    ---------
+    dim : int
+        number of values of every index
+
+    rank : int
+        number of indices
+
+    symmetries : list
+        generators (permutation, sign) of the symmetry group: T[index] = sign * T[image], where
+        image[n] = index[permutation[n]], see swap and riemann_symmetries
+
+    components : dict
+        initial components, index tuple -> value
+    """
+
+    def __init__(self, dim, rank, symmetries=(), components=None):
+        for permutation, sign in symmetries:
+            if sorted(permutation) != list(range(rank)) or sign not in (1, -1):
+                sys.exit("SymmetricTensor: a symmetry is a permutation of the indices and a sign +-1")
+        self.dim = dim
+        self.rank = rank
+        self.symmetries = [(tuple(permutation), sign) for permutation, sign in symmetries]
+        self.components = {}                                                            # canonical index -> value
+        self._canonical = {}                                                            # index -> (canonical, sign)
+        if components is not None:
+            for index, value in components.items():
+                self[index] = value
+
+    @property
+    def shape(self):
+        return (self.dim,) * self.rank
+
+    def orbit(self, index):
+        """All index tuples related to index by the symmetries, index tuple -> sign. The sign is 0 if the component
+        vanishes by symmetry.
+        """
+
+        index = tuple(index)
+        orbit = {index: 1}
+        queue = [index]
+        while queue:
+            current = queue.pop()
+            for permutation, sign in self.symmetries:
+                image = tuple(current[n] for n in permutation)
+                image_sign = orbit[current] * sign
+                if image not in orbit:
+                    orbit[image] = image_sign
+                    queue.append(image)
+                elif orbit[image] != image_sign:
+                    return {member: 0 for member in orbit}
+        return orbit
+
+    def canonical(self, index):
+        """Canonical index and sign with T[index] = sign * T[canonical], the sign is 0 for vanishing components.
+        """
+
+        index = tuple(index)
+        try:
+            return self._canonical[index]
+        except KeyError:
+            pass
+        if len(index) != self.rank or not all(0 <= i < self.dim for i in index):
+            sys.exit("SymmetricTensor: index {} out of range".format(index))
+        orbit = self.orbit(index)
+        canonical = min(orbit)
+        sign = orbit[index] * orbit[canonical] if orbit[index] else 0
+        self._canonical[index] = (canonical, sign)
+        return canonical, sign
+
+    def is_canonical(self, index):
+        canonical, sign = self.canonical(index)
+        return sign != 0 and canonical == tuple(index)
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        canonical, sign = self.canonical(index)
+        if sign == 0:
+            return sy.S.Zero
+        value = self.components.get(canonical)
+        if value is None:
+            return sy.S.Zero
+        return value if sign == 1 else -value
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, tuple):
+            index = (index,)
+        canonical, sign = self.canonical(index)
+        if sign == 0 or value == 0:
+            self.components.pop(canonical, None)
+            return
+        self.components[canonical] = value if sign == 1 else -value
+
+    def __len__(self):
+        return len(self.components)
+
+    def __repr__(self):
+        return "SymmetricTensor(dim={}, rank={}, {} stored components)".format(self.dim, self.rank, len(self))
+
+    def copy(self):
+        """Tensor with the same symmetries and a copy of the components.
+        """
+
+        tensor = SymmetricTensor(self.dim, self.rank, self.symmetries)
+        tensor.components = dict(self.components)
+        tensor._canonical = self._canonical                                             # depends on the symmetries only
+        return tensor
+
+    def items(self):
+        """Stored (canonical) components, index tuple -> value.
+        """
+
+        return self.components.items()
+
+    def entries(self):
+        """Generator of all non-vanishing components (index, value), including the ones given by symmetry.
+        """
+
+        for canonical, value in self.components.items():
+            for index, sign in self.orbit(canonical).items():
+                yield index, value if sign == 1 else -value
+
+    def contraction_terms(self, matrix, axis, symmetries=None):
+        """Terms of the contraction U[..., k, ...] = sum_a matrix[k, a] T[..., a, ...] over the index at axis, e.g. raising
+        an index with the inverse metric. The terms are returned unsummed, such that every component can be summed and
+        simplified separately (and in parallel).
+
+        parameter
+        ---------
+        matrix : sympy matrix (dim x dim)
+
+        axis : int
+            contracted index of this tensor
+
+        symmetries : list
+            symmetries of the result, default: the symmetries of this tensor which do not move the index at axis
+
+        return
+        ------
+        result : SymmetricTensor
+            empty tensor with the symmetries of the result
+
+        terms : dict
+            canonical index of the result -> list of terms
+        """
+
+        if symmetries is None:
+            symmetries = [(permutation, sign) for permutation, sign in self.symmetries if permutation[axis] == axis]
+        result = SymmetricTensor(self.dim, self.rank, symmetries)
+        rows = [[(k, matrix[k, a]) for k in range(self.dim) if matrix[k, a] != 0] for a in range(self.dim)]
+        terms = {}
+        for index, value in self.entries():
+            for k, factor in rows[index[axis]]:
+                target = index[:axis] + (k,) + index[axis + 1:]
+                if result.is_canonical(target):
+                    terms.setdefault(target, []).append(factor * value)
+
+        return result, terms
+
+    def trace_terms(self, matrix, first, second, symmetries=()):
+        """Terms of the contraction U[...] = sum_{a, b} matrix[b, a] T[..., a, ..., b, ...] of the indices first < second,
+        e.g. the Ricci tensor R_{ac} = g^{db} R_{badc} from the Riemann tensor.
+
+        parameter
+        ---------
+        matrix : sympy matrix (dim x dim)
+
+        first, second : int
+            contracted indices of this tensor
+
+        symmetries : list
+            symmetries of the result, a tensor of rank self.rank - 2
+
+        return
+        ------
+        result : SymmetricTensor
+            empty tensor with the symmetries of the result
+
+        terms : dict
+            canonical index of the result -> list of terms
+        """
+
+        result = SymmetricTensor(self.dim, self.rank - 2, symmetries)
+        terms = {}
+        for index, value in self.entries():
+            factor = matrix[index[second], index[first]]
+            if factor == 0:
+                continue
+            target = tuple(i for n, i in enumerate(index) if n not in (first, second))
+            if result.is_canonical(target):
+                terms.setdefault(target, []).append(factor * value)
+
+        return result, terms
+
+    def raise_index(self, matrix, axis):
+        """Contraction U[..., k, ...] = sum_a matrix[k, a] T[..., a, ...], e.g. raise_index(metric.inv_metric, 0).
+        """
+
+        result, terms = self.contraction_terms(matrix, axis)
+        for index, index_terms in terms.items():
+            result[index] = sy.Add(*index_terms)
+        return result
+
+    def lower_index(self, matrix, axis):
+        """Contraction with the metric, same as raise_index.
+        """
+
+        return self.raise_index(matrix, axis)
+
+    def matrix(self, *fixed):
+        """Sympy matrix of the last two indices with the leading indices fixed, e.g. T.matrix(k) = T[k, :, :].
+        """
+
+        if len(fixed) != self.rank - 2:
+            sys.exit("SymmetricTensor: matrix needs the values of the first {} indices".format(self.rank - 2))
+        matrix = sy.matrices.zeros(self.dim)
+        for i in range(self.dim):
+            for j in range(self.dim):
+                matrix[i, j] = self[tuple(fixed) + (i, j)]
+        return matrix
+
+    def dense(self):
+        """All components as sympy array.
+        """
+
+        components = [self[index] for index in itertools.product(range(self.dim), repeat=self.rank)]
+        if self.rank == 0:
+            return components[0]
+        return sy.ImmutableDenseNDimArray(components, self.shape)
@@ -0,0 +1,30 @@
+import os
+from phypylib.cache import DiskCache, default_directory, strategy_key
+from phypylib.simplification import Simplification
+
+
+def test_cache_is_opt_in(monkeypatch):
+    monkeypatch.delenv("PHYPYLIB_CACHE", raising=False)
+    assert default_directory() is None
+    monkeypatch.setenv("PHYPYLIB_CACHE", "off")
+    assert default_directory() is None
+    monkeypatch.setenv("PHYPYLIB_CACHE", "/tmp/phypylib-cache")
+    assert default_directory() == "/tmp/phypylib-cache"
+    monkeypatch.setenv("PHYPYLIB_CACHE", "on")
+    monkeypatch.setenv("XDG_CACHE_HOME", "/tmp/xdg")
+    assert default_directory() == os.path.join("/tmp/xdg", "phypylib")
+
+
+def test_store_load_and_evict(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=4000, rescan=3)
+    for n in range(20):
+        cache.store(cache.key("entry", n), {"value": "x" * 500})
+        assert sum(size for mtime, size, path in cache.entries()) <= 4000
+    assert cache.load(cache.key("entry", 19)) == {"value": "x" * 500}
+    assert cache.load(cache.key("entry", 0)) is None                                    # evicted
+    assert cache._size == sum(size for mtime, size, path in cache.entries())
+
+
+def test_budgeted_results_are_not_cached():
+    assert strategy_key(Simplification(passes=["cancel"])) is not None
+    assert strategy_key(Simplification(passes=["cancel"], timeout=1)) is None
@@ -0,0 +1,111 @@
+from collections import Counter
+import pytest
+from phypylib.quantum_field_theory import FeynmanDiagrams, RealScalarField4D, WickContraction
+
+
+def fields(names):
+    return [RealScalarField4D(name=name) for name in names]
+
+
+def matchings(positions):
+    """All perfect matchings of the positions, by brute force.
+    """
+
+    if not positions:
+        yield []
+        return
+    first = positions[0]
+    for n in range(1, len(positions)):
+        rest = positions[1:n] + positions[n + 1:]
+        for matching in matchings(rest):
+            yield [(first, positions[n])] + matching
+
+
+def components(pairs):
+    """Connected components of the graph of a contraction, the vertices are the field indices.
+    """
+
+    parent = {}
+
+    def find(a):
+        while parent.setdefault(a, a) != a:
+            a = parent[a]
+        return a
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups = {}
+    for a in list(parent):
+        groups.setdefault(find(a), set()).add(a)
+    return list(groups.values())
+
+
+def brute_force_patterns(wick):
+    """Distinct contractions with their multiplicities from all (2n-1)!! pairings, filtered like wick.ignore.
+    """
+
+    indices = wick.field_indices
+    patterns = Counter()
+    for matching in matchings(list(range(len(indices)))):
+        pairs = tuple(sorted(tuple(sorted((indices[i], indices[j]))) for i, j in matching))
+        groups = components(pairs)
+        if wick.ignore == "vac" and any(not group & wick.external for group in groups):
+            continue
+        if wick.ignore == "disconnected" and len(groups) > 1:
+            continue
+        patterns[pairs] += 1
+    return patterns
+
+
+NAMES = [
+    ["a", "b"],
+    ["a", "b", "c", "c"],
+    ["x"] * 4,
+    ["a", "b"] + ["x"] * 4,
+    ["a", "b", "c", "d"] + ["x"] * 4,
+    ["x"] * 4 + ["y"] * 4,
+    ["a", "b"] + ["x"] * 4 + ["y"] * 4,
+    ["a", "b", "c", "d"] + ["x"] * 4 + ["y"] * 4,
+]
+
+
+@pytest.mark.parametrize("ignore", [None, "vac", "disconnected"])
+@pytest.mark.parametrize("names", NAMES, ids=lambda names: "".join(names))
+def test_patterns_match_brute_force(names, ignore):
+    wick = WickContraction(fields(names), mode=None, ignore=ignore)
+    patterns = Counter()
+    for pairs, multiplier in wick.iter_patterns():
+        pairs = tuple(sorted(tuple(sorted(pair)) for pair in pairs))
+        assert pairs not in patterns                                                    # every pattern once
+        patterns[pairs] = multiplier
+
+    assert patterns == brute_force_patterns(wick)
+    assert sum(1 for partner in wick.iter_pairings()) == sum(patterns.values())
+
+
+def test_symmetry_factors_of_the_two_point_function():
+    names = ["phi_1", "phi_2"] + 4 * ["phi_x"] + 4 * ["phi_y"]
+    diagrams = FeynmanDiagrams(WickContraction(fields(names), mode=None, ignore="disconnected"))
+
+    factors = {tuple(diagram["pairs"]): diagram["symmetry_factor"] for diagram in diagrams.diagrams}
+    assert factors == {
+        ((1, 4), (2, 3), (3, 3), (3, 4), (4, 4)): 4,
+        ((1, 4), (2, 3), (3, 4), (3, 4), (3, 4)): 6,
+        ((1, 4), (2, 4), (3, 3), (3, 4), (3, 4)): 4,
+    }
+
+
+def test_symmetry_factors_of_vacuum_diagrams():
+    figure_eight = FeynmanDiagrams(WickContraction(fields(["x"] * 4), mode=None))
+    assert [diagram["symmetry_factor"] for diagram in figure_eight.diagrams] == [8]
+
+    diagrams = FeynmanDiagrams(WickContraction(fields(["x"] * 4 + ["y"] * 4), mode=None))
+    assert sorted(diagram["symmetry_factor"] for diagram in diagrams.diagrams) == [16, 48, 128]
+
+
+def test_isomorphic_contractions_share_a_memo_entry():
+    names = ["a", "b"] + ["x"] * 4 + ["y"] * 4 + ["z"] * 4
+    diagrams = FeynmanDiagrams(WickContraction(fields(names), mode=None, ignore="disconnected"))
+    labellings = sum(diagram["labellings"] for diagram in diagrams.diagrams)
+
+    assert len(diagrams.cache) < labellings
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from phypylib.hafnian import hafnian, hafnian_repeated
+
+
+def matchings(positions):
+    """All perfect matchings of the positions.
+    """
+
+    if not positions:
+        yield []
+        return
+    first = positions[0]
+    for n in range(1, len(positions)):
+        for matching in matchings(positions[1:n] + positions[n + 1:]):
+            yield [(first, positions[n])] + matching
+
+
+def brute_force_hafnian(A):
+    """Sum over all perfect matchings of the product of the matched entries.
+    """
+
+    return sum(np.prod([A[i, j] for i, j in matching]) for matching in matchings(list(range(A.shape[0]))))
+
+
+def random_symmetric(shape, complex_entries=False, seed=0):
+    rng = np.random.default_rng(seed)
+    A = rng.normal(size=shape)
+    if complex_entries:
+        A = A + 1j * rng.normal(size=shape)
+    return (A + np.swapaxes(A, -1, -2)) / 2
+
+
+@pytest.mark.parametrize("size", [2, 4, 6, 8])
+@pytest.mark.parametrize("complex_entries", [False, True])
+def test_hafnian_matches_brute_force(size, complex_entries):
+    A = random_symmetric((size, size), complex_entries, seed=size)
+    assert np.allclose(hafnian(A), brute_force_hafnian(A))
+
+
+def test_hafnian_of_ones_counts_the_pairings():
+    for n in range(1, 6):
+        double_factorial = np.prod(np.arange(2*n - 1, 0, -2))
+        assert np.isclose(hafnian(np.ones((2*n, 2*n))), double_factorial)
+
+
+def test_hafnian_batched():
+    A = random_symmetric((3, 2, 6, 6))
+    values = hafnian(A)
+    assert values.shape == (3, 2)
+    for index in np.ndindex(3, 2):
+        assert np.isclose(values[index], brute_force_hafnian(A[index]))
+
+
+@pytest.mark.parametrize("size", [1, 3, 5])
+def test_hafnian_odd_size_vanishes(size):
+    assert hafnian(random_symmetric((size, size))) == 0
+    values = hafnian(random_symmetric((4, size, size)))
+    assert values.shape == (4,) and np.all(values == 0)
+
+
+def expanded(A, repetitions):
+    index = [i for i, m in enumerate(repetitions) for copy in range(m)]
+    return A[np.ix_(index, index)]
+
+
+@pytest.mark.parametrize("repetitions", [[2], [1, 1], [1, 1, 2], [2, 2], [1, 3], [4, 4], [1, 1, 4, 4], [3, 2, 1]])
+def test_hafnian_repeated_matches_brute_force(repetitions):
+    A = random_symmetric((len(repetitions), len(repetitions)), seed=len(repetitions))
+    assert np.allclose(hafnian_repeated(A, repetitions), brute_force_hafnian(expanded(A, repetitions)))
+
+
+def test_hafnian_repeated_batched():
+    repetitions = [1, 1, 4]
+    A = random_symmetric((5, 3, 3))
+    values = hafnian_repeated(A, repetitions)
+    assert values.shape == (5,)
+    for index in range(5):
+        assert np.isclose(values[index], brute_force_hafnian(expanded(A[index], repetitions)))
+
+
+@pytest.mark.parametrize("repetitions", [[1], [1, 2], [3, 2, 2]])
+def test_hafnian_repeated_odd_total_vanishes(repetitions):
+    values = hafnian_repeated(random_symmetric((2, len(repetitions), len(repetitions))), repetitions)
+    assert values.shape == (2,) and np.all(values == 0)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+import sympy as sy
+from phypylib.cache import set_cache
+from phypylib.general_relativity import FRWMetric, Metric, SchwarzschildMetric
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    set_cache(None)
+    yield
+    set_cache(None)
+
+
+def calculate(metric):
+    metric.ricci_scalar(retR=False, simplify=True)
+    metric.einstein_tensor(retE=False, simplify=True)
+    return metric
+
+
+def fresh(metric, matrix=None):
+    """Metric with the same (or the given) matrix and coordinates, all quantities calculated from scratch.
+    """
+
+    matrix = metric.metric if matrix is None else matrix
+    matrix = np.array([[matrix[i, j] for j in range(metric.dim)] for i in range(metric.dim)], dtype=object)
+    return calculate(Metric(matrix=matrix, t=metric.t, x=metric.x, y=metric.y, z=metric.z))
+
+
+def assert_equal(actual, expected):
+    actual, expected = sy.flatten([actual]), sy.flatten([expected])
+    assert len(actual) == len(expected)
+    for a, b in zip(actual, expected):
+        assert sy.simplify(a - b) == 0, (a, b)
+
+
+def assert_same_quantities(metric, reference):
+    assert_equal(metric.inv_metric, reference.inv_metric)
+    assert_equal(metric.christoffel.dense(), reference.christoffel.dense())
+    assert_equal(metric.riemanntensor.dense(), reference.riemanntensor.dense())
+    assert_equal(metric.riccitensor, reference.riccitensor)
+    assert_equal(metric.ricciscalar, reference.ricciscalar)
+    metric.einstein_tensor(retE=False, simplify=True)                                   # discarded by the update
+    assert_equal(metric.einsteintensor, reference.einsteintensor)
+    for k in range(metric.dim):
+        assert_equal(metric.cs[k], reference.cs[k])
+
+
+@pytest.mark.parametrize("i, j, value", [
+    (0, 0, "1 - Rs/r + Q**2/r**2"),                                                     # Reissner-Nordstrom
+    (1, 1, "-1/(1 - Rs/r + Q**2/r**2)"),
+    (0, 3, "Q*sin(theta)**2/r"),                                                        # couples t and phi
+])
+def test_update_component_schwarzschild(i, j, value):
+    metric = calculate(SchwarzschildMetric())
+    value = sy.sympify(value, locals={name: sy.Symbol(name, real=True) for name in ["Rs", "r", "Q", "theta"]})
+    metric.update_component(i, j, value, simplify=True)
+
+    matrix = sy.Matrix(SchwarzschildMetric().metric)
+    matrix[i, j] = matrix[j, i] = value
+    assert_same_quantities(metric, fresh(metric, matrix))
+
+
+def test_update_component_frw():
+    metric = calculate(FRWMetric())
+    t, r = metric.t, metric.x
+    a = sy.Function("a", real=True)(t)
+    value = -a**2 / (1 + r**2)
+    metric.update_component(1, 1, value, simplify=True)
+
+    matrix = sy.Matrix(FRWMetric().metric)
+    matrix[1, 1] = value
+    assert_same_quantities(metric, fresh(metric, matrix))
+
+
+def test_successive_updates_match_a_fresh_metric():
+    metric = calculate(SchwarzschildMetric())
+    Rs, r, Q = sy.symbols("Rs r Q", real=True)
+    metric.update_component(0, 0, 1 - Rs/r + Q**2/r**2, simplify=True)
+    metric.update_component(1, 1, -1/(1 - Rs/r + Q**2/r**2), simplify=True)
+
+    assert_same_quantities(metric, fresh(metric))
+
+
+@pytest.mark.parametrize("substitutions", ["k", "a", "both"])
+def test_subs_frw(substitutions):
+    metric = calculate(FRWMetric())
+    t = metric.t
+    k = sy.Symbol("k", real=True)
+    a = sy.Function("a", real=True)(t)
+    substitutions = {"k": {k: 0}, "a": {a: t**sy.Rational(2, 3)}, "both": {k: 1, a: t}}[substitutions]
+    substituted = metric.subs(substitutions, simplify=True)
+
+    matrix = sy.Matrix(metric.metric).subs(substitutions)
+    assert_same_quantities(substituted, fresh(metric, matrix))
+
+
+def test_subs_schwarzschild():
+    metric = calculate(SchwarzschildMetric())
+    substituted = metric.subs({sy.Symbol("Rs", real=True): 2}, simplify=True)
+
+    matrix = sy.Matrix(metric.metric).subs(sy.Symbol("Rs", real=True), 2)
+    assert_same_quantities(substituted, fresh(metric, matrix))
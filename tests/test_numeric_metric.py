@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from phypylib.numeric_metric import NumericMetric
+
+
+def sampled_metric(length=12):
+    """Stationary test metric with the coordinates (r, t, theta, phi), sampled on a grid with length slices along r.
+    """
+
+    r = np.linspace(3, 6, length)
+    t = np.zeros(1)
+    theta = np.linspace(0.5, 1.5, 8)
+    phi = np.linspace(0, 1, 8)
+    R, T, Theta, Phi = np.meshgrid(r, t, theta, phi, indexing="ij")
+    g = np.zeros((4, 4) + R.shape)
+    g[0, 0] = -1 / (1 - 1 / R)
+    g[1, 1] = 1 - 1 / R
+    g[2, 2] = -R**2
+    g[3, 3] = -R**2 * np.sin(Theta)**2
+    g[0, 2] = g[2, 0] = 0.1 * R * np.cos(Theta) * np.sin(Phi)
+    spacings = [r[1] - r[0], 1, theta[1] - theta[0], phi[1] - phi[0]]
+    return g, spacings
+
+
+@pytest.mark.parametrize("order", [2, 4, 6])
+@pytest.mark.parametrize("chunk", [1, 2, 5, 7, 11])
+def test_chunked_matches_unchunked(order, chunk):
+    g, spacings = sampled_metric()
+    whole = NumericMetric(g, spacings, order=order)
+    chunked = NumericMetric(g, spacings, order=order)
+
+    np.testing.assert_allclose(chunked.christoffel_symbols(chunk=chunk), whole.christoffel_symbols(),
+                               rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(chunked.ricci_tensor(chunk=chunk), whole.ricci_tensor(), rtol=1e-8, atol=1e-10)
+
+
+@pytest.mark.parametrize("chunk", [1, 5])
+def test_chunked_periodic(chunk):
+    g, spacings = sampled_metric()
+    whole = NumericMetric(g, spacings, order=4, periodic=[True, False, False, True])
+    chunked = NumericMetric(g, spacings, order=4, periodic=[True, False, False, True])
+
+    np.testing.assert_allclose(chunked.christoffel_symbols(chunk=chunk), whole.christoffel_symbols(),
+                               rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(chunked.ricci_tensor(chunk=chunk), whole.ricci_tensor(), rtol=1e-8, atol=1e-10)
@@ -0,0 +1,61 @@
+import os
+import re
+import pytest
+from phypylib.cache import set_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDES = {                                                                            # example -> names it leaves open
+    8: """
+positions = np.array([[0, 10, np.pi/2, 0]] * 4, dtype=float)
+spatial_velocities = np.array([[-1, 0, 0.01 * n] for n in range(4)], dtype=float)
+""",
+    11: """
+propagator = np.random.default_rng(0).normal(size=(5, 3, 3))
+propagator = propagator + np.swapaxes(propagator, -1, -2)
+""",
+    14: """
+dt = dx = dy = dz = 0.1
+x = np.arange(20) * dx
+g = np.zeros((4, 4, 1, 20, 8, 8))
+g[0, 0] = 1
+g[1, 1] = -(1 + x**2)[:, None, None]
+g[2, 2] = g[3, 3] = -1
+""",
+}
+
+REPLACEMENTS = {                                                                        # example -> smaller sizes and
+    13: [("/scratch/phypylib", "scratch")],                                             # paths in the working directory
+    18: [("256", "16"), ("steps=2000", "steps=20"), ("every=100", "every=10")],
+    19: [("10000", "100"), ("1000)", "100)"), ("workers=4", "workers=2")],
+}
+
+
+def readme_examples():
+    """Python blocks of the README examples, one pytest.param(number, code) per example.
+    """
+
+    with open(os.path.join(ROOT, "README.md")) as file:
+        readme = file.read()
+    examples = []
+    for number, section in re.findall(r"### Example (\d+):(.*?)(?=\n### |\n## |\Z)", readme, re.S):
+        code = "\n".join(re.findall(r"```python\n(.*?)```", section, re.S))
+        examples.append(pytest.param(int(number), code, id="example_" + number))
+    return examples
+
+
+@pytest.fixture(autouse=True)
+def no_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    set_cache(None)
+    yield
+    set_cache(None)
+
+
+@pytest.mark.parametrize("number, code", readme_examples())
+def test_readme_example(number, code):
+    for old, new in REPLACEMENTS.get(number, []):
+        assert old in code, "README example {} changed, update REPLACEMENTS".format(number)
+        code = code.replace(old, new)
+    namespace = {}
+    exec("from imports import *\n" + PRELUDES.get(number, "") + code, namespace)